@@ -0,0 +1,484 @@
+"""Метаданные видео из заголовков контейнера без декодера.
+
+Разбираются MP4/MOV (``moov``/``mvhd``/``tkhd``/``mdhd``/``stsd``/``stts``),
+Matroska/WebM (EBML: ``Info`` и ``Tracks``) и AVI (``avih``/``strh``/``dmlh``),
+для MPEG-TS/M2TS – только длительность по меткам PTS в начале и конце файла.
+Читаются несколько небольших блоков, файл целиком не открывается ни
+декодером, ни в память; вызов укладывается в миллисекунды.
+
+``read_header`` возвращает словарь с теми же ключами, что ``probe.read_metadata``,
+но только с найденными значениями; None – формат не распознан или повреждён.
+Как и ``probe``, модуль не импортирует Qt и вызывается в процессах пула импорта.
+"""
+import os
+import struct
+
+# Не читаем moov больше этого: при огромном индексе дешевле отдать файл OpenCV
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+# Сколько байт в начале и конце TS просматривать в поисках PTS
+TS_SCAN_BYTES = 1024 * 1024
+
+HEADER_KEYS = ("duration_sec", "width", "height", "fps", "frame_count", "codec")
+
+
+class HeaderError(Exception):
+    """Заголовок не удалось разобрать (обрезан или не того формата)."""
+
+
+def is_complete(metadata: dict | None) -> bool:
+    """Хватает ли метаданных, чтобы не открывать файл в OpenCV."""
+    return bool(metadata) and all(metadata.get(key) for key in ("duration_sec", "width", "height", "fps"))
+
+
+def read_header(file_path: str) -> dict | None:
+    """Метаданные из заголовков контейнера или None (см. описание модуля)."""
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(12)
+            if len(head) < 12:
+                return None
+            if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+                result = _read_avi(f)
+            elif head[:4] == b"\x1a\x45\xdf\xa3":
+                result = _read_matroska(f)
+            elif head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+                result = _read_mp4(f, os.fstat(f.fileno()).st_size)
+            elif _ts_packet_size(f) is not None:
+                result = _read_ts(f, os.fstat(f.fileno()).st_size)
+            else:
+                return None
+    except (OSError, HeaderError, struct.error, ValueError, IndexError):
+        return None
+    if not result:
+        return None
+    if not result.get("frame_count") and result.get("duration_sec") and result.get("fps"):
+        result["frame_count"] = round(result["duration_sec"] * result["fps"])
+    return {key: result[key] for key in HEADER_KEYS if result.get(key)}
+
+
+# ---------- MP4 / MOV ----------
+
+def _iter_boxes(data: bytes, start: int = 0, end: int | None = None):
+    """(тип, начало содержимого, конец) для боксов в data[start:end]."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _find_box(data: bytes, start: int, end: int, box_type: bytes) -> tuple[int, int] | None:
+    for found, body_start, body_end in _iter_boxes(data, start, end):
+        if found == box_type:
+            return body_start, body_end
+    return None
+
+
+def _find_path(data: bytes, start: int, end: int, *path: bytes) -> tuple[int, int] | None:
+    span = (start, end)
+    for box_type in path:
+        span = _find_box(data, span[0], span[1], box_type)
+        if span is None:
+            return None
+    return span
+
+
+def _read_moov(f, file_size: int) -> bytes:
+    """Содержимое верхнеуровневого moov: прыгаем по заголовкам боксов, mdat не читаем."""
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack_from(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            raise HeaderError("bad box size")
+        if box_type == b"moov":
+            if size > MAX_MOOV_BYTES:
+                raise HeaderError("moov too large")
+            f.seek(pos + header_size)
+            data = f.read(size - header_size)
+            if len(data) < size - header_size:
+                raise HeaderError("truncated moov")
+            return data
+        pos += size
+    raise HeaderError("no moov")
+
+
+def _mp4_times(data: bytes, start: int) -> tuple[int, int]:
+    """(timescale, duration) из mvhd/mdhd – у обоих одинаковое начало."""
+    version = data[start]
+    if version == 1:
+        return struct.unpack_from(">IQ", data, start + 20)
+    return struct.unpack_from(">II", data, start + 12)
+
+
+def _read_mp4(f, file_size: int) -> dict:
+    moov = _read_moov(f, file_size)
+    result = {}
+    mvhd = _find_box(moov, 0, len(moov), b"mvhd")
+    if mvhd is not None:
+        timescale, duration = _mp4_times(moov, mvhd[0])
+        if timescale and duration:
+            result["duration_sec"] = duration / timescale
+    for box_type, trak_start, trak_end in _iter_boxes(moov):
+        if box_type != b"trak":
+            continue
+        hdlr = _find_path(moov, trak_start, trak_end, b"mdia", b"hdlr")
+        if hdlr is None or moov[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+            continue
+        tkhd = _find_box(moov, trak_start, trak_end, b"tkhd")
+        if tkhd is not None:
+            # ширина и высота – последние 8 байт tkhd, числа 16.16
+            width, height = struct.unpack_from(">II", moov, tkhd[1] - 8)
+            result["width"], result["height"] = width >> 16, height >> 16
+        mdhd = _find_path(moov, trak_start, trak_end, b"mdia", b"mdhd")
+        track_duration = None
+        if mdhd is not None:
+            timescale, duration = _mp4_times(moov, mdhd[0])
+            if timescale and duration:
+                track_duration = duration / timescale
+                result.setdefault("duration_sec", track_duration)
+        stbl = _find_path(moov, trak_start, trak_end, b"mdia", b"minf", b"stbl")
+        if stbl is not None:
+            stsd = _find_box(moov, stbl[0], stbl[1], b"stsd")
+            if stsd is not None and stsd[1] - stsd[0] >= 16 + 36:
+                entry = stsd[0] + 8
+                result["codec"] = moov[entry + 4:entry + 8].decode("latin-1").strip("\x00 ") or None
+                # Размер кадра в кодеке (без учёта анаморфного растяжения из tkhd) – как у OpenCV
+                coded_width, coded_height = struct.unpack_from(">HH", moov, entry + 8 + 24)
+                if coded_width and coded_height:
+                    result["width"], result["height"] = coded_width, coded_height
+            stts = _find_box(moov, stbl[0], stbl[1], b"stts")
+            if stts is not None:
+                count = struct.unpack_from(">I", moov, stts[0] + 4)[0]
+                frames = sum(struct.unpack_from(">I", moov, stts[0] + 8 + 8 * i)[0] for i in range(count))
+                result["frame_count"] = frames
+                # Средняя частота – верна и для переменной частоты кадров
+                if frames and track_duration:
+                    result["fps"] = frames / track_duration
+        break  # первая видеодорожка
+    return result
+
+
+# ---------- Matroska / WebM ----------
+
+_EBML_UNKNOWN = object()
+
+_MKV_SEGMENT = 0x18538067
+_MKV_SEEK_HEAD = 0x114D9B74
+_MKV_SEEK = 0x4DBB
+_MKV_SEEK_ID = 0x53AB
+_MKV_SEEK_POSITION = 0x53AC
+_MKV_INFO = 0x1549A966
+_MKV_TIMECODE_SCALE = 0x2AD7B1
+_MKV_DURATION = 0x4489
+_MKV_TRACKS = 0x1654AE6B
+_MKV_TRACK_ENTRY = 0xAE
+_MKV_TRACK_TYPE = 0x83
+_MKV_CODEC_ID = 0x86
+_MKV_DEFAULT_DURATION = 0x23E383
+_MKV_VIDEO = 0xE0
+_MKV_PIXEL_WIDTH = 0xB0
+_MKV_PIXEL_HEIGHT = 0xBA
+_MKV_CLUSTER = 0x1F43B675
+
+# CodecID Matroska -> обозначение, близкое к тому, что возвращает OpenCV
+_MKV_CODECS = {
+    "V_MPEG4/ISO/AVC": "h264",
+    "V_MPEGH/ISO/HEVC": "hevc",
+    "V_VP8": "VP80",
+    "V_VP9": "VP90",
+    "V_AV1": "AV01",
+    "V_MPEG4/ISO/ASP": "FMP4",
+    "V_MPEG2": "MPG2",
+    "V_MJPEG": "MJPG",
+}
+
+
+def _read_vint(f, keep_marker: bool) -> tuple[int | object, int]:
+    """EBML-число переменной длины: (значение, длина в байтах). Размер из одних единиц – «неизвестен»."""
+    first = f.read(1)
+    if not first:
+        raise HeaderError("unexpected end of file")
+    b = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not b & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise HeaderError("bad EBML vint")
+    rest = f.read(length - 1)
+    if len(rest) < length - 1:
+        raise HeaderError("unexpected end of file")
+    value = b if keep_marker else b & (mask - 1)
+    all_ones = (b & (mask - 1)) == mask - 1 and all(x == 0xFF for x in rest)
+    for x in rest:
+        value = (value << 8) | x
+    if not keep_marker and all_ones:
+        return _EBML_UNKNOWN, length
+    return value, length
+
+
+def _read_element_header(f) -> tuple[int, int | object]:
+    element_id, _ = _read_vint(f, keep_marker=True)
+    size, _ = _read_vint(f, keep_marker=False)
+    return element_id, size
+
+
+def _read_uint(f, size: int) -> int:
+    return int.from_bytes(f.read(size), "big") if size else 0
+
+
+def _read_float(f, size: int) -> float:
+    data = f.read(size)
+    if size == 4:
+        return struct.unpack(">f", data)[0]
+    if size == 8:
+        return struct.unpack(">d", data)[0]
+    return 0.0
+
+
+def _iter_children(f, end: int | None):
+    """(id, размер, начало содержимого) дочерних элементов до позиции end; f стоит на начале содержимого."""
+    while end is None or f.tell() < end:
+        try:
+            element_id, size = _read_element_header(f)
+        except HeaderError:
+            return
+        start = f.tell()
+        yield element_id, size, start
+        if size is _EBML_UNKNOWN:
+            return
+        f.seek(start + size)
+
+
+def _mkv_info(f, end: int, result: dict):
+    timecode_scale = 1_000_000
+    duration = None
+    for element_id, size, _ in _iter_children(f, end):
+        if element_id == _MKV_TIMECODE_SCALE:
+            timecode_scale = _read_uint(f, size)
+        elif element_id == _MKV_DURATION:
+            duration = _read_float(f, size)
+    if duration:
+        result["duration_sec"] = duration * timecode_scale / 1e9
+
+
+def _mkv_tracks(f, end: int, result: dict):
+    for element_id, size, start in _iter_children(f, end):
+        if element_id != _MKV_TRACK_ENTRY or size is _EBML_UNKNOWN:
+            continue
+        track = {}
+        for child_id, child_size, child_start in _iter_children(f, start + size):
+            if child_id == _MKV_TRACK_TYPE:
+                track["type"] = _read_uint(f, child_size)
+            elif child_id == _MKV_CODEC_ID:
+                track["codec"] = f.read(child_size).decode("latin-1").rstrip("\x00")
+            elif child_id == _MKV_DEFAULT_DURATION:
+                track["default_duration"] = _read_uint(f, child_size)
+            elif child_id == _MKV_VIDEO and child_size is not _EBML_UNKNOWN:
+                for video_id, video_size, _ in _iter_children(f, child_start + child_size):
+                    if video_id == _MKV_PIXEL_WIDTH:
+                        track["width"] = _read_uint(f, video_size)
+                    elif video_id == _MKV_PIXEL_HEIGHT:
+                        track["height"] = _read_uint(f, video_size)
+        if track.get("type") != 1:
+            continue
+        codec = track.get("codec")
+        if codec:
+            result["codec"] = _MKV_CODECS.get(codec, codec.removeprefix("V_"))
+        result["width"] = track.get("width")
+        result["height"] = track.get("height")
+        if track.get("default_duration"):
+            result["fps"] = 1e9 / track["default_duration"]
+        return
+
+
+def _read_matroska(f) -> dict:
+    f.seek(0)
+    _, size = _read_element_header(f)
+    if size is _EBML_UNKNOWN:
+        raise HeaderError("bad EBML header")
+    f.seek(f.tell() + size)
+    element_id, segment_size = _read_element_header(f)
+    if element_id != _MKV_SEGMENT:
+        raise HeaderError("no segment")
+    segment_start = f.tell()
+    segment_end = None if segment_size is _EBML_UNKNOWN else segment_start + segment_size
+    result = {}
+    seen = set()
+    seek_positions = {}
+    for element_id, size, start in _iter_children(f, segment_end):
+        if element_id == _MKV_CLUSTER:
+            break  # дальше – кадры; Info и Tracks, если их ещё нет, ищем через SeekHead
+        if size is _EBML_UNKNOWN:
+            break
+        if element_id == _MKV_INFO:
+            _mkv_info(f, start + size, result)
+            seen.add(_MKV_INFO)
+        elif element_id == _MKV_TRACKS:
+            _mkv_tracks(f, start + size, result)
+            seen.add(_MKV_TRACKS)
+        elif element_id == _MKV_SEEK_HEAD:
+            for seek_id, seek_size, seek_start in _iter_children(f, start + size):
+                if seek_id != _MKV_SEEK or seek_size is _EBML_UNKNOWN:
+                    continue
+                target = position = None
+                for child_id, child_size, _ in _iter_children(f, seek_start + seek_size):
+                    if child_id == _MKV_SEEK_ID:
+                        target = _read_uint(f, child_size)
+                    elif child_id == _MKV_SEEK_POSITION:
+                        position = _read_uint(f, child_size)
+                if target is not None and position is not None:
+                    seek_positions[target] = position
+        if seen == {_MKV_INFO, _MKV_TRACKS}:
+            return result
+    for element_id, reader in ((_MKV_INFO, _mkv_info), (_MKV_TRACKS, _mkv_tracks)):
+        if element_id in seen or element_id not in seek_positions:
+            continue
+        f.seek(segment_start + seek_positions[element_id])
+        found_id, size = _read_element_header(f)
+        if found_id == element_id and size is not _EBML_UNKNOWN:
+            reader(f, f.tell() + size, result)
+    return result
+
+
+# ---------- AVI ----------
+
+def _iter_chunks(data: bytes, start: int, end: int):
+    """(fourcc, начало данных, размер) RIFF-чанков; для LIST fourcc – тип списка с префиксом 'LIST:'."""
+    pos = start
+    while pos + 8 <= end:
+        fourcc, size = struct.unpack_from("<4sI", data, pos)
+        body = pos + 8
+        if fourcc == b"LIST":
+            yield b"LIST:" + data[body:body + 4], body + 4, size - 4
+        else:
+            yield fourcc, body, size
+        pos = body + size + (size & 1)
+
+
+def _read_avi(f) -> dict:
+    # hdrl – первый список файла; его размер известен из заголовка
+    f.seek(12)
+    list_header = f.read(12)
+    if len(list_header) < 12 or list_header[:4] != b"LIST" or list_header[8:12] != b"hdrl":
+        raise HeaderError("no hdrl")
+    size = struct.unpack_from("<I", list_header, 4)[0] - 4
+    data = f.read(min(size, 1024 * 1024))
+    result = {}
+    avih_frames = dml_frames = None
+    for fourcc, start, chunk_size in _iter_chunks(data, 0, len(data)):
+        if fourcc == b"avih":
+            micro_sec_per_frame, = struct.unpack_from("<I", data, start)
+            avih_frames, = struct.unpack_from("<I", data, start + 16)
+            width, height = struct.unpack_from("<II", data, start + 32)
+            result.update(width=width, height=height)
+            if micro_sec_per_frame:
+                result["fps"] = 1e6 / micro_sec_per_frame
+        elif fourcc == b"LIST:strl" and "codec" not in result:
+            _avi_stream(data, start, start + chunk_size, result)
+        elif fourcc == b"LIST:odml":
+            for sub, sub_start, _ in _iter_chunks(data, start, start + chunk_size):
+                if sub == b"dmlh":
+                    dml_frames, = struct.unpack_from("<I", data, sub_start)
+    # Порядок надёжности: dmlh (OpenDML > 1 ГБ) > dwLength видеопотока > avih (только первый RIFF)
+    frames = dml_frames or result.pop("stream_frames", None) or avih_frames
+    result.pop("stream_frames", None)
+    if frames:
+        result["frame_count"] = frames
+        if result.get("fps"):
+            result["duration_sec"] = frames / result["fps"]
+    return result
+
+
+def _avi_stream(data: bytes, start: int, end: int, result: dict):
+    """strh/strf видеопотока: частота, длина и кодек."""
+    strh = strf = None
+    for fourcc, chunk_start, _ in _iter_chunks(data, start, end):
+        if fourcc == b"strh":
+            strh = chunk_start
+        elif fourcc == b"strf":
+            strf = chunk_start
+    if strh is None or data[strh:strh + 4] != b"vids":
+        return
+    handler = data[strh + 4:strh + 8]
+    scale, rate, _, length = struct.unpack_from("<IIII", data, strh + 20)
+    if scale and rate:
+        result["fps"] = rate / scale
+    result["stream_frames"] = length
+    # В strf (BITMAPINFOHEADER) biCompression – кодек; в strh часто пусто или «DIB »
+    compression = data[strf + 16:strf + 20] if strf is not None else b""
+    codec = (compression if compression.strip(b"\x00 ") else handler).decode("latin-1").strip("\x00 ")
+    result["codec"] = codec or None
+
+
+# ---------- MPEG-TS / M2TS ----------
+
+def _ts_packet_size(f) -> int | None:
+    """188 (TS) или 192 (M2TS, .mts), если в начале файла идут синхробайты 0x47."""
+    f.seek(0)
+    data = f.read(192 * 4)
+    for size, offset in ((188, 0), (192, 4)):
+        if len(data) >= size * 3 + offset and all(data[offset + size * i] == 0x47 for i in range(3)):
+            return size
+    return None
+
+
+def _ts_pts_values(data: bytes, packet_size: int):
+    """PTS видео-PES (stream_id 0xE0–0xEF) в порядке следования пакетов."""
+    offset = packet_size - 188
+    # Выравниваемся по синхробайту: блок из конца файла может начинаться с середины пакета
+    start = 0
+    while start + packet_size * 2 <= len(data):
+        if data[start + offset] == 0x47 and data[start + offset + packet_size] == 0x47:
+            break
+        start += 1
+    for pos in range(start + offset, len(data) - 187, packet_size):
+        if data[pos] != 0x47 or not data[pos + 1] & 0x40:  # payload_unit_start_indicator
+            continue
+        adaptation = (data[pos + 3] >> 4) & 0x3
+        payload = pos + 4
+        if adaptation == 2:
+            continue
+        if adaptation == 3:
+            payload += 1 + data[pos + 4]
+        pes = data[payload:pos + 188]
+        if len(pes) < 14 or pes[:3] != b"\x00\x00\x01" or not 0xE0 <= pes[3] <= 0xEF:
+            continue
+        if not pes[7] & 0x80:
+            continue
+        p = pes[9:14]
+        yield (((p[0] >> 1) & 0x07) << 30) | (p[1] << 22) | ((p[2] >> 1) << 15) | (p[3] << 7) | (p[4] >> 1)
+
+
+def _read_ts(f, file_size: int) -> dict:
+    packet_size = _ts_packet_size(f)
+    f.seek(0)
+    first = next(_ts_pts_values(f.read(TS_SCAN_BYTES), packet_size), None)
+    f.seek(max(file_size - TS_SCAN_BYTES, 0))
+    tail = list(_ts_pts_values(f.read(TS_SCAN_BYTES), packet_size))
+    if first is None or not tail:
+        return {}
+    # Кадры идут в порядке декодирования – берём максимальный PTS хвоста; 33 бита могут переполниться
+    last = max(tail)
+    span = (last - first) % (1 << 33)
+    return {"duration_sec": span / 90000} if span else {}
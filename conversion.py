@@ -0,0 +1,1063 @@
+import os
+import json
+import time
+import queue
+import shutil
+import signal
+import threading
+import subprocess
+from collections import deque
+from typing import Callable
+
+from PyQt6.QtCore import QObject, QThread, Qt, pyqtSignal
+
+import database
+import tracing
+
+
+FORMATS = ["mp4", "avi", "mkv", "mov", "webm", "mpg"]
+
+
+class FramePool:
+    """Переиспользуемые буферы кадров: чтение идёт в готовый массив без новой аллокации.
+
+    Число буферов ограничено, поэтому ``acquire`` блокируется, когда все
+    кадры заняты в очереди конвейера – память не растёт, даже если запись
+    отстаёт от чтения.
+    """
+
+    def __init__(self, shape: tuple[int, ...], size: int):
+        import numpy as np  # pylint: disable=import-error
+
+        self.shape = shape
+        self._free: queue.Queue = queue.Queue()
+        buffers = [np.empty(shape, dtype=np.uint8) for _ in range(size)]
+        # Возвращаются только свои буферы: чужой массив того же размера (новый кадр
+        # от OpenCV) в пул не попадает, и число буферов не растёт. Ссылки держим,
+        # чтобы id потерянного буфера не достался другому массиву
+        self._buffers = buffers
+        self._owned = {id(b) for b in buffers}
+        for buffer in buffers:
+            self._free.put(buffer)
+
+    def acquire(self, timeout: float | None = None):
+        return self._free.get(timeout=timeout)
+
+    def release(self, buffer) -> None:
+        if buffer is not None and id(buffer) in self._owned:
+            self._free.put(buffer)
+
+
+class StageStats:
+    """Счётчик стадии конвейера: кадры и время собственно работы (без ожидания очередей)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.frames += 1
+        self.busy += seconds
+
+    @property
+    def fps(self) -> float:
+        """Пропускная способность стадии, если бы ей не приходилось ждать соседей."""
+        return self.frames / self.busy if self.busy else 0.0
+
+
+_END = object()  # маркер конца потока кадров
+
+
+def proxy_transform(max_height: int) -> Callable:
+    """Преобразование для прокси: уменьшение до ``max_height`` строк с сохранением пропорций."""
+    import cv2  # pylint: disable=import-error
+
+    def transform(frame):
+        h, w = frame.shape[:2]
+        if h <= max_height:
+            return frame
+        # Чётная ширина: многие кодеки не принимают нечётные размеры
+        width = max(int(w * max_height / h) // 2 * 2, 2)
+        return cv2.resize(frame, (width, max_height), interpolation=cv2.INTER_AREA)
+
+    return transform
+
+
+class ThroughputMeter:
+    """Скорость обработки по настенным часам, сглаженная экспоненциальным средним.
+
+    ``update`` получает общее число обработанных единиц (кадров, секунд
+    видео); скорость на каждом интервале смешивается с прежней оценкой,
+    поэтому ETA не скачет от кадра к кадру и не зависит от длительности
+    ролика – только от того, как быстро он реально обрабатывается.
+
+    ``pause``/``resume`` останавливают часы: время на паузе не попадает в
+    интервал и не занижает скорость. Их вызывают из другого потока, чем
+    ``update``, поэтому состояние защищено блокировкой.
+    """
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.rate = 0.0  # единиц в секунду
+        self._last_count = 0.0
+        self._last_time: float | None = None
+        self._paused_at: float | None = None
+        self._lock = threading.Lock()
+
+    def update(self, count: float, now: float | None = None) -> float:
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if self._paused_at is not None:
+                return self.rate
+            if self._last_time is None:
+                self._last_count, self._last_time = count, now
+                return self.rate
+            elapsed = now - self._last_time
+            if elapsed <= 0:
+                return self.rate
+            instant = (count - self._last_count) / elapsed
+            self.rate = instant if self.rate == 0 else self.alpha * instant + (1 - self.alpha) * self.rate
+            self._last_count, self._last_time = count, now
+            return self.rate
+
+    def pause(self, now: float | None = None) -> None:
+        with self._lock:
+            if self._paused_at is None:
+                self._paused_at = time.perf_counter() if now is None else now
+
+    def resume(self, now: float | None = None) -> None:
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if self._paused_at is None:
+                return
+            # Сдвигаем начало интервала на длительность паузы
+            if self._last_time is not None:
+                self._last_time += now - self._paused_at
+            self._paused_at = None
+
+    def eta(self, remaining: float) -> float:
+        """Оставшееся время в секундах; 0 – пока скорость неизвестна."""
+        return max(remaining, 0.0) / self.rate if self.rate > 0 else 0.0
+
+
+FORMAT_FOURCC = {
+    "mp4": "mp4v",
+    "avi": "XVID",
+    "mkv": "X264",  # может не работать – зависит от сборки OpenCV
+    "mov": "mp4v",
+    "webm": "VP90",  # поддержка ограничена
+    "mpg": "PIM1",
+}
+
+
+class OutputTarget:
+    """Один выходной файл конвертации: путь, кодек (fourcc) и необязательное уменьшение."""
+
+    def __init__(self, path: str, fourcc: str | None = None, max_height: int | None = None,
+                 transform: Callable | None = None):
+        self.path = path
+        self.format = os.path.splitext(path)[1].lstrip('.').lower()
+        self.fourcc = fourcc or FORMAT_FOURCC.get(self.format, "XVID")
+        self.max_height = max_height
+        # transform(frame) -> frame; по умолчанию – уменьшение до max_height
+        self.transform = transform or (proxy_transform(max_height) if max_height else None)
+
+    def to_params(self) -> dict:
+        """Для сохранения в очереди; пользовательский transform не сохраняется."""
+        return {"path": self.path, "fourcc": self.fourcc, "max_height": self.max_height}
+
+
+class _SharedFrame:
+    """Декодированный кадр, общий для всех выходов; буфер возвращается в пул последним из них."""
+
+    __slots__ = ("frame", "_refs", "_lock", "_pool")
+
+    def __init__(self, frame, refs: int, pool: FramePool):
+        self.frame = frame
+        self._refs = refs
+        self._lock = threading.Lock()
+        self._pool = pool
+
+    def release(self) -> None:
+        with self._lock:
+            self._refs -= 1
+            last = self._refs == 0
+        if last:
+            self._pool.release(self.frame)
+
+
+class CVConvertWorker(QObject):
+    """Конвертирует видео средствами OpenCV: читаем кадры и записываем заново с нужным кодеком.
+
+    Источник декодируется один раз; каждый кадр раздаётся всем выходам
+    (основной ``output_path`` и ``extra_outputs``). Чтение и каждый выход
+    работают в своих потоках (OpenCV отпускает GIL в read/resize/write),
+    связанных ограниченными очередями; преобразование кадра выполняется в
+    потоке своего выхода, параллельно с остальными. Буферы кадров берутся
+    из ``FramePool``.
+    """
+
+    progressChanged = pyqtSignal(int, float, float)  # проценты (-1 – неизвестно), ETA (сек), скорость (x реального времени)
+    stageThroughputChanged = pyqtSignal(dict)  # стадия -> кадров/с собственной работы
+    finished = pyqtSignal(bool, str)  # успех, путь основного выходного файла
+
+    QUEUE_SIZE = 8
+    STATS_INTERVAL = 0.5  # сек между отчётами о прогрессе и пропускной способности
+
+    def __init__(self, input_path: str, output_path: str, transform: Callable | None = None,
+                 duration_sec: float | None = None, output_fps: float | None = None,
+                 extra_outputs: list[OutputTarget] | None = None,
+                 start_sec: float | None = None, end_sec: float | None = None):
+        super().__init__()
+        self._in = input_path
+        self._out = output_path
+        # Фрагмент: читаем только [start_sec, end_sec), к началу переходим перемоткой
+        self._start_sec = start_sec
+        self._end_sec = end_sec
+        self._targets = [OutputTarget(output_path, transform=transform)] + list(extra_outputs or [])
+        # Частота кадров результата: лишние кадры пропускаются через grab() без декодирования в буфер
+        self._output_fps = output_fps
+        self._frames_in = 0  # прочитано входных кадров, включая пропущенные
+        # Длительность из библиотеки: по ней оцениваем число кадров, если контейнер его не сообщает
+        self._duration_sec = duration_sec
+        self._cancelled = threading.Event()
+        self._failed = False
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._meter = ThroughputMeter()
+
+    # ---------- Управление из других потоков ----------
+
+    def cancel(self):
+        """Кооперативная отмена: конвейер остановится на ближайшем кадре, частичные файлы удаляются."""
+        self._cancelled.set()
+        self._resumed.set()
+
+    @property
+    def can_pause(self) -> bool:
+        return True
+
+    def pause(self):
+        self._resumed.clear()
+        self._meter.pause()
+
+    def resume(self):
+        self._meter.resume()
+        self._resumed.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _fail(self):
+        self._failed = True
+        self.cancel()
+
+    def _remove_partial_output(self):
+        for target in self._targets:
+            try:
+                os.remove(target.path)
+            except OSError:
+                pass
+
+    # ---------- Стадии конвейера ----------
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Кладёт в очередь, пока не отменено; False – конвейер останавливается."""
+        while not self._cancelled.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read_stage(self, cap, pool: FramePool, out_queues: list[queue.Queue], stats: StageStats,
+                    keep_ratio: float, max_frames: int | None):
+        kept = 0
+        try:
+            while not self._cancelled.is_set():
+                if max_frames is not None and self._frames_in >= max_frames:
+                    break  # конец фрагмента
+                # Пауза: ждём без нагрузки на CPU
+                self._resumed.wait()
+                # Прореживание: кадр нужен, когда выходная шкала времени дошла до следующего кадра
+                if keep_ratio < 1.0 and int(self._frames_in * keep_ratio) < kept:
+                    with tracing.span("grab", "convert"):
+                        grabbed = cap.grab()
+                    if not grabbed:
+                        break
+                    self._frames_in += 1
+                    continue
+                try:
+                    buffer = pool.acquire(timeout=0.1)
+                except queue.Empty:
+                    continue
+                t0 = time.perf_counter()
+                with tracing.span("read", "convert"):
+                    ret, frame = cap.read(buffer)
+                stats.add(time.perf_counter() - t0)
+                if not ret:
+                    pool.release(buffer)
+                    break
+                self._frames_in += 1
+                kept += 1
+                # Если кадр не поместился в буфер, OpenCV вернёт новый массив – старый возвращаем
+                if frame is not buffer:
+                    pool.release(buffer)
+                shared = _SharedFrame(frame, len(out_queues), pool)
+                if not all(self._put(q, shared) for q in out_queues):
+                    break
+        finally:
+            for q in out_queues:
+                self._put(q, _END)
+
+    def _output_stage(self, target: OutputTarget, in_q: queue.Queue, fps: float,
+                      transform_stats: StageStats, write_stats: StageStats):
+        import cv2  # pylint: disable=import-error
+
+        # Writer открывается по первому кадру: размер после преобразования заранее неизвестен
+        writer = None
+        try:
+            while True:
+                try:
+                    item = in_q.get(timeout=0.1)
+                except queue.Empty:
+                    if self._cancelled.is_set():
+                        break
+                    continue
+                if item is _END:
+                    break
+                frame = item.frame
+                if target.transform is not None:
+                    t0 = time.perf_counter()
+                    with tracing.span("transform", "convert"):
+                        frame = target.transform(frame)
+                    transform_stats.add(time.perf_counter() - t0)
+                    if frame is not item.frame:
+                        # Уменьшенная копия своя – общий кадр другим выходам больше не держим
+                        item.release()
+                        item = None
+                if writer is None:
+                    size = (frame.shape[1], frame.shape[0])
+                    writer = cv2.VideoWriter(target.path, cv2.VideoWriter_fourcc(*target.fourcc), fps, size)
+                    if not writer.isOpened():
+                        # Попытка fallback
+                        writer = cv2.VideoWriter(target.path, cv2.VideoWriter_fourcc(*"XVID"), fps, size)
+                    if not writer.isOpened():
+                        writer = None
+                        if item is not None:
+                            item.release()
+                        self._fail()
+                        break
+                t0 = time.perf_counter()
+                with tracing.span("write", "convert"):
+                    writer.write(frame)
+                write_stats.add(time.perf_counter() - t0)
+                if item is not None:
+                    item.release()
+        finally:
+            if writer is not None:
+                writer.release()
+
+    @staticmethod
+    def _stage_names(targets: list[OutputTarget]) -> list[str]:
+        """Суффиксы стадий выходов: пусто для одного выхода, иначе формат (и номер при совпадении)."""
+        if len(targets) == 1:
+            return [""]
+        formats = [t.format for t in targets]
+        return [f" {fmt}" if formats.count(fmt) == 1 else f" {fmt}{i + 1}" for i, fmt in enumerate(formats)]
+
+    @tracing.traced("CVConvertWorker.run", cat="convert")
+    def run(self):
+        import cv2  # pylint: disable=import-error
+
+        cap = cv2.VideoCapture(self._in)
+        if not cap.isOpened():
+            self.finished.emit(False, self._out)
+            return
+
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        out_fps = fps
+        if self._output_fps and self._output_fps < fps:
+            out_fps = self._output_fps
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if total_frames <= 0 and self._duration_sec:
+            total_frames = int(self._duration_sec * fps)
+
+        max_frames = None
+        if self._start_sec:
+            # Бэкенд FFmpeg в OpenCV переходит к ближайшему предыдущему ключевому кадру
+            # и декодирует только до нужной отметки – кадры до неё не раздаются выходам
+            cap.set(cv2.CAP_PROP_POS_MSEC, self._start_sec * 1000)
+        if self._end_sec is not None:
+            max_frames = max(int((self._end_sec - (self._start_sec or 0)) * fps), 0)
+            total_frames = min(total_frames, max_frames) if total_frames else max_frames
+        elif self._start_sec and total_frames:
+            total_frames = max(total_frames - int(self._start_sec * fps), 0)
+
+        # Буферов хватает на заполненные очереди всех выходов плюс кадр в работе у каждой стадии
+        stages = 1 + len(self._targets)
+        pool = FramePool((height, width, 3), self.QUEUE_SIZE * len(self._targets) + stages)
+        read_stats = StageStats("read")
+        output_stats = []
+        out_queues = [queue.Queue(maxsize=self.QUEUE_SIZE) for _ in self._targets]
+        output_threads = []
+        for target, suffix, q in zip(self._targets, self._stage_names(self._targets), out_queues):
+            stats = (StageStats("transform" + suffix), StageStats("write" + suffix))
+            output_stats.append(stats)
+            output_threads.append(threading.Thread(
+                target=self._output_stage, args=(target, q, out_fps, *stats),
+                name=f"convert-write{suffix.replace(' ', '-')}", daemon=True,
+            ))
+        reader = threading.Thread(target=self._read_stage, args=(cap, pool, out_queues, read_stats, out_fps / fps, max_frames),
+                                  name="convert-read", daemon=True)
+        reader.start()
+        for thread in output_threads:
+            thread.start()
+
+        def report():
+            stats = {read_stats.name: read_stats.fps}
+            for target, (transform_stats, write_stats) in zip(self._targets, output_stats):
+                if target.transform is not None:
+                    stats[transform_stats.name] = transform_stats.fps
+                stats[write_stats.name] = write_stats.fps
+            self.stageThroughputChanged.emit(stats)
+
+        # Поток воркера только следит за стадиями и отчитывается – по времени, а не по номеру
+        # кадра: частота отчётов не зависит от fps и длины ролика
+        meter = self._meter
+        meter.update(0)
+        for thread in output_threads:
+            while thread.is_alive():
+                thread.join(self.STATS_INTERVAL)
+                if not self._resumed.is_set():
+                    continue  # на паузе скорость не меряем
+                # Прогресс – по самому медленному выходу, в пересчёте на входные кадры
+                processed = min(w.frames for _, w in output_stats) * fps / out_fps
+                meter.update(processed)
+                if total_frames:
+                    percent = min(int(processed / total_frames * 100), 99)
+                    eta = meter.eta(total_frames - processed)
+                else:
+                    percent, eta = -1, 0.0
+                self.progressChanged.emit(percent, eta, meter.rate / fps)
+                report()
+
+        reader.join()
+        cap.release()
+        report()
+
+        if self._failed or self._cancelled.is_set():
+            self._remove_partial_output()
+            self.finished.emit(False, self._out)
+            return
+
+        self.progressChanged.emit(100, 0.0, meter.rate / fps)
+        self.finished.emit(True, self._out)
+
+
+# ---------- Бэкенд ffmpeg ----------
+
+# Кодеки, которые контейнер принимает без перекодирования (имена – как их сообщает ffprobe)
+CONTAINER_CODECS = {
+    "mp4": {"video": {"h264", "hevc", "mpeg4", "av1", "vp9"}, "audio": {"aac", "mp3", "ac3", "eac3", "opus", "alac"}},
+    "mov": {"video": {"h264", "hevc", "mpeg4", "prores", "mjpeg"}, "audio": {"aac", "mp3", "alac", "pcm_s16le"}},
+    "avi": {"video": {"mpeg4", "h264", "mjpeg", "msmpeg4v2", "msmpeg4v3"}, "audio": {"mp3", "ac3", "pcm_s16le"}},
+    "webm": {"video": {"vp8", "vp9", "av1"}, "audio": {"opus", "vorbis"}},
+    "mpg": {"video": {"mpeg1video", "mpeg2video"}, "audio": {"mp2", "ac3"}},
+    "mkv": None,  # Matroska принимает практически всё
+}
+
+# Кодеки для потоков, которые контейнер не принимает как есть
+DEFAULT_ENCODERS = {
+    "mp4": ("libx264", "aac"),
+    "mov": ("libx264", "aac"),
+    "mkv": ("libx264", "aac"),
+    "avi": ("mpeg4", "libmp3lame"),
+    "webm": ("libvpx-vp9", "libopus"),
+    "mpg": ("mpeg2video", "mp2"),
+}
+
+# На Windows не показываем консольное окно дочернего процесса
+_CREATION_FLAGS = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+
+def ffmpeg_path() -> str | None:
+    return shutil.which("ffmpeg")
+
+
+def ffprobe_path() -> str | None:
+    return shutil.which("ffprobe")
+
+
+def probe_streams(file_path: str) -> dict | None:
+    """Кодеки потоков и длительность через ffprobe: {"video": [...], "audio": [...], "duration": сек}."""
+    ffprobe = ffprobe_path()
+    if ffprobe is None:
+        return None
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "stream=codec_type,codec_name:format=duration",
+             "-of", "json", file_path],
+            capture_output=True, check=True, timeout=30, creationflags=_CREATION_FLAGS,
+        ).stdout
+        info = json.loads(out)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+    result = {"video": [], "audio": [], "duration": None}
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") in ("video", "audio"):
+            result[stream["codec_type"]].append(stream.get("codec_name"))
+    try:
+        result["duration"] = float(info.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        pass
+    return result
+
+
+def keyframe_before(file_path: str, sec: float, window: float = 10.0) -> float | None:
+    """Время последнего ключевого кадра видео не позже ``sec`` (ищем в окне ``window`` секунд)."""
+    ffprobe = ffprobe_path()
+    if ffprobe is None:
+        return None
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+             "-read_intervals", f"{max(sec - window, 0):.3f}%{sec + 0.001:.3f}",
+             "-show_entries", "frame=best_effort_timestamp_time", "-of", "csv=p=0", file_path],
+            capture_output=True, text=True, check=True, timeout=30, creationflags=_CREATION_FLAGS,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    times = []
+    for line in out.split():
+        try:
+            times.append(float(line.strip(",")))
+        except ValueError:
+            continue
+    before = [t for t in times if t <= sec + 0.001]
+    return max(before) if before else None
+
+
+def keyframe_times(file_path: str) -> list[float] | None:
+    """Времена всех ключевых кадров первого видеопотока (с), по возрастанию, или None.
+
+    Читаются только заголовки пакетов (флаг K), без декодирования – даже
+    для длинных файлов это секунды, поэтому индекс строится один раз и кэшируется.
+    """
+    ffprobe = ffprobe_path()
+    if ffprobe is None:
+        return None
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", file_path],
+            capture_output=True, text=True, check=True, timeout=120, creationflags=_CREATION_FLAGS,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    times = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" not in flags:
+            continue
+        try:
+            times.append(float(pts))
+        except ValueError:
+            continue
+    return sorted(times) or None
+
+
+def codec_args(streams: dict, fmt: str, copy_video: bool = True) -> list[str]:
+    """Аргументы кодеков: копируем поток, если контейнер его принимает, иначе перекодируем.
+
+    ``copy_video=False`` запрещает копирование видео (фрагмент начинается не с ключевого кадра).
+    """
+    accepted = CONTAINER_CODECS.get(fmt, {"video": set(), "audio": set()})
+    video_encoder, audio_encoder = DEFAULT_ENCODERS.get(fmt, ("libx264", "aac"))
+    args = []
+    for kind, flag, encoder in (("video", "-c:v", video_encoder), ("audio", "-c:a", audio_encoder)):
+        codecs = streams.get(kind) or []
+        if not codecs:
+            continue
+        copy = accepted is None or all(codec in accepted[kind] for codec in codecs)
+        if kind == "video" and not copy_video:
+            copy = False
+        args += [flag, "copy" if copy else encoder]
+    return args
+
+
+class FFmpegConvertWorker(QObject):
+    """Конвертация внешним ffmpeg: потоки, которые принимает целевой контейнер, копируются без
+    перекодирования (секунды вместо минут), остальные перекодируются; аудио сохраняется.
+
+    Интерфейс совпадает с CVConvertWorker. Прогресс читается из ``-progress pipe:1``.
+    """
+
+    progressChanged = pyqtSignal(int, float, float)  # проценты (-1 – неизвестно), ETA (сек), скорость (x реального времени)
+    stageThroughputChanged = pyqtSignal(dict)  # не используется: стадии внутри ffmpeg
+    finished = pyqtSignal(bool, str)  # успех, путь выходного файла
+
+    # Допуск, в пределах которого начало фрагмента считается совпавшим с ключевым кадром
+    KEYFRAME_TOLERANCE = 0.05
+
+    def __init__(self, input_path: str, output_path: str, duration_sec: float | None = None,
+                 start_sec: float | None = None, end_sec: float | None = None):
+        super().__init__()
+        self._in = input_path
+        self._out = output_path
+        self._duration_sec = duration_sec
+        self._start_sec = start_sec
+        self._end_sec = end_sec
+        self._process: subprocess.Popen | None = None
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._paused = False
+        self._meter = ThroughputMeter()
+        self.error_output = ""
+
+    # ---------- Управление из других потоков ----------
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                if self._paused:
+                    self._signal(signal.SIGCONT)
+                self._process.terminate()
+
+    def _signal(self, sig) -> None:
+        try:
+            self._process.send_signal(sig)
+        except OSError:
+            pass
+
+    @property
+    def can_pause(self) -> bool:
+        """Процесс останавливается сигналом SIGSTOP – на Windows его нет, и пауза недоступна."""
+        return hasattr(signal, "SIGSTOP")
+
+    def pause(self):
+        """Останавливает процесс ffmpeg; до его запуска пауза запоминается и применяется сразу после."""
+        with self._lock:
+            if self.can_pause and not self._paused:
+                if self._process is not None:
+                    self._signal(signal.SIGSTOP)
+                self._paused = True
+                self._meter.pause()
+
+    def resume(self):
+        with self._lock:
+            if self._paused:
+                if self._process is not None:
+                    self._signal(signal.SIGCONT)
+                self._paused = False
+                self._meter.resume()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def _remove_partial_output(self):
+        try:
+            os.remove(self._out)
+        except OSError:
+            pass
+
+    def command(self, streams: dict) -> list[str]:
+        fmt = os.path.splitext(self._out)[1].lstrip('.').lower()
+        seek_args, range_args = [], []
+        copy_video = True
+        if self._start_sec:
+            # -ss перед -i: переход по индексу контейнера, без декодирования начала файла
+            seek_args = ["-ss", f"{self._start_sec:.3f}"]
+            # Копировать видео можно, только если фрагмент начинается с ключевого кадра,
+            # иначе до следующего ключевого кадра было бы нечего показать
+            keyframe = keyframe_before(self._in, self._start_sec)
+            copy_video = keyframe is not None and self._start_sec - keyframe <= self.KEYFRAME_TOLERANCE
+        if self._end_sec is not None:
+            range_args = ["-t", f"{self._end_sec - (self._start_sec or 0):.3f}"]
+        return [
+            ffmpeg_path() or "ffmpeg", "-hide_banner", "-nostdin", "-y", "-loglevel", "error",
+            *seek_args, "-i", self._in, *range_args,
+            # Только видео и аудио: субтитры и данные многие контейнеры не принимают
+            "-map", "0:v?", "-map", "0:a?",
+            *codec_args(streams, fmt, copy_video),
+            "-progress", "pipe:1", "-nostats",
+            self._out,
+        ]
+
+    def run(self):
+        streams = probe_streams(self._in)
+        if streams is None or self._cancelled.is_set():
+            self.finished.emit(False, self._out)
+            return
+        duration = streams.get("duration") or self._duration_sec
+        if duration and self._start_sec:
+            duration = max(duration - self._start_sec, 0)
+        if self._end_sec is not None:
+            duration = self._end_sec - (self._start_sec or 0)
+        stderr_tail: deque[str] = deque(maxlen=20)
+        try:
+            with self._lock:
+                self._process = subprocess.Popen(
+                    self.command(streams), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                    text=True, encoding="utf-8", errors="replace", creationflags=_CREATION_FLAGS,
+                )
+                # Отмена или пауза, пришедшие до запуска процесса
+                if self._cancelled.is_set():
+                    self._process.terminate()
+                elif self._paused:
+                    self._signal(signal.SIGSTOP)
+        except OSError as exc:
+            self.error_output = str(exc)
+            self.finished.emit(False, self._out)
+            return
+
+        # stderr читаем отдельно, иначе заполненный канал остановит ffmpeg
+        stderr_reader = threading.Thread(
+            target=lambda: stderr_tail.extend(self._process.stderr), name="ffmpeg-stderr", daemon=True
+        )
+        stderr_reader.start()
+
+        # Блок прогресса – строки key=value, завершается строкой progress=continue|end
+        block: dict[str, str] = {}
+        meter = self._meter
+        meter.update(0)
+        speed = 0.0
+        for line in self._process.stdout:
+            key, _, value = line.strip().partition("=")
+            if key != "progress":
+                block[key] = value
+                continue
+            try:
+                done_sec = int(block.get("out_time_us", "")) / 1_000_000
+            except ValueError:
+                continue
+            # Единица измерения – секунды видео, поэтому скорость сразу в «x реального времени»
+            speed = meter.update(done_sec)
+            if duration:
+                percent = max(0, min(int(done_sec / duration * 100), 99))
+                self.progressChanged.emit(percent, meter.eta(duration - done_sec), speed)
+            else:
+                self.progressChanged.emit(-1, 0.0, speed)
+        returncode = self._process.wait()
+        stderr_reader.join()
+        self.error_output = "".join(stderr_tail)
+
+        if self._cancelled.is_set() or returncode != 0:
+            self._remove_partial_output()
+            self.finished.emit(False, self._out)
+            return
+        self.progressChanged.emit(100, 0.0, speed)
+        self.finished.emit(True, self._out)
+
+
+def create_convert_worker(input_path: str, output_path: str, transform: Callable | None = None,
+                          duration_sec: float | None = None,
+                          extra_outputs: list[OutputTarget] | None = None,
+                          start_sec: float | None = None, end_sec: float | None = None) -> QObject:
+    """ffmpeg, если он установлен и нужен один выход без покадрового преобразования, иначе OpenCV.
+
+    Несколько выходов пишет OpenCV: источник декодируется один раз для всех.
+    ``start_sec``/``end_sec`` задают фрагмент; оба бэкенда перематывают к его началу.
+    """
+    if transform is None and not extra_outputs and ffmpeg_path() and ffprobe_path():
+        return FFmpegConvertWorker(input_path, output_path, duration_sec, start_sec=start_sec, end_sec=end_sec)
+    return CVConvertWorker(input_path, output_path, transform, duration_sec, extra_outputs=extra_outputs,
+                           start_sec=start_sec, end_sec=end_sec)
+
+
+# ---------- Очередь конвертации ----------
+
+
+class ConversionJob:
+    """Задание очереди; состояние дублируется в таблице conversion_jobs."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    PAUSED = "paused"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+    CONVERT = "convert"
+    PROXY = "proxy"
+
+    def __init__(self, job_id: int, input_path: str, output_path: str, fmt: str, status: str = QUEUED,
+                 kind: str = CONVERT, params: dict | None = None):
+        self.id = job_id
+        self.kind = kind
+        self.params = params or {}
+        self.input_path = input_path
+        self.output_path = output_path
+        self.format = fmt
+        self.status = status
+        self.progress = 0
+        self.eta = 0.0
+        self.speed = 0.0
+        self.stage_fps: dict[str, float] = {}
+        # Приостановленное задание ждёт свободного слота, чтобы продолжить
+        self.resume_pending = False
+        self.worker: CVConvertWorker | FFmpegConvertWorker | None = None
+        self.thread: QThread | None = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in self.FINISHED_STATES
+
+
+class ConversionQueue(QObject):
+    """Очередь пакетной конвертации с ограничением числа параллельных заданий.
+
+    Каждое задание выполняет свой CVConvertWorker в отдельном QThread.
+    Одновременно работает не больше ``max_parallel`` заданий (по умолчанию –
+    половина ядер: кодировщик OpenCV сам использует несколько потоков).
+    Незавершённые задания хранятся в базе и после перезапуска выполняются
+    заново с начала.
+    """
+
+    jobAdded = pyqtSignal(int)  # id задания
+    jobChanged = pyqtSignal(int)  # id задания – статус или прогресс
+    jobFinished = pyqtSignal(int, bool)  # id задания, успех
+    aggregateProgressChanged = pyqtSignal(int)  # общий прогресс неотменённых заданий, % (см. aggregate_progress)
+    proxyReady = pyqtSignal(int, str)  # id видео, путь прокси
+
+    # Внутренние: сигналы воркеров с id задания, из их потоков в GUI-поток
+    _jobProgress = pyqtSignal(int, int, float, float)
+    _jobStages = pyqtSignal(int, dict)
+    _jobDone = pyqtSignal(int, bool)
+    _jobThreadFinished = pyqtSignal(int)
+
+    def __init__(self, db: database.VideoDatabase, max_parallel: int | None = None, parent=None):
+        super().__init__(parent)
+        self._db = db
+        self.max_parallel = max_parallel or max(1, (os.cpu_count() or 2) // 2)
+        self.jobs: dict[int, ConversionJob] = {}
+        self.paused = False
+        self._jobProgress.connect(self._on_progress)
+        self._jobDone.connect(self._on_finished)
+        self._jobStages.connect(self._on_stage_throughput)
+        self._jobThreadFinished.connect(self._on_thread_finished)
+        self._restore()
+
+    def _restore(self):
+        for job_id, input_path, output_path, fmt, status, kind, params in self._db.load_conversion_jobs():
+            # Прерванные при закрытии задания начинаем заново
+            if status == ConversionJob.RUNNING:
+                status = ConversionJob.QUEUED
+            self.jobs[job_id] = ConversionJob(job_id, input_path, output_path, fmt, status, kind, params)
+
+    # ---------- Публичный интерфейс ----------
+
+    def enqueue(self, input_path: str, output_path: str, fmt: str,
+                extra_outputs: list[OutputTarget] | None = None) -> ConversionJob:
+        """Задание конвертации; ``extra_outputs`` пишутся из того же декодированного потока."""
+        params = {"outputs": [target.to_params() for target in extra_outputs]} if extra_outputs else None
+        return self._add_job(input_path, output_path, fmt, ConversionJob.CONVERT, params)
+
+    def enqueue_proxy(self, video_id: int, input_path: str, output_path: str,
+                      max_height: int, max_fps: float | None = None) -> ConversionJob:
+        """Прокси для плеера: уменьшенная копия, по готовности связывается с видео в базе."""
+        params = {"video_id": video_id, "height": max_height, "fps": max_fps}
+        fmt = os.path.splitext(output_path)[1].lstrip('.').lower()
+        return self._add_job(input_path, output_path, fmt, ConversionJob.PROXY, params)
+
+    def _add_job(self, input_path: str, output_path: str, fmt: str, kind: str, params: dict | None) -> ConversionJob:
+        job_id = self._db.insert_conversion_job(input_path, output_path, fmt, kind, params)
+        job = ConversionJob(job_id, input_path, output_path, fmt, kind=kind, params=params)
+        self.jobs[job_id] = job
+        self.jobAdded.emit(job_id)
+        self._dispatch()
+        return job
+
+    def start(self):
+        """Запускает восстановленные из базы задания."""
+        self._dispatch()
+
+    def can_pause_job(self, job_id: int) -> bool:
+        """Задание ещё не стартовало или его воркер умеет останавливаться (ffmpeg на Windows – нет)."""
+        job = self.jobs.get(job_id)
+        if job is None or job.is_finished:
+            return False
+        return job.worker is None or job.worker.can_pause
+
+    def pause_job(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job is not None and job.resume_pending:
+            # Ещё не продолжилось – просто остаётся на паузе
+            job.resume_pending = False
+            self.jobChanged.emit(job.id)
+            return
+        if job is None or job.status == ConversionJob.PAUSED or not self.can_pause_job(job_id):
+            return
+        if job.worker is not None:
+            job.worker.pause()
+        self._set_status(job, ConversionJob.PAUSED)
+        # Приостановленное задание не занимает слот очереди
+        self._dispatch()
+
+    def resume_job(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job is None or job.status != ConversionJob.PAUSED:
+            return
+        if job.worker is not None:
+            # Слот могло занять другое задание: продолжим, когда он освободится
+            job.resume_pending = True
+            self.jobChanged.emit(job.id)
+        else:
+            self._set_status(job, ConversionJob.QUEUED)
+        self._dispatch()
+
+    def cancel_job(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job is None or job.is_finished:
+            return
+        self._set_status(job, ConversionJob.CANCELLED)
+        if job.worker is not None:
+            job.worker.cancel()  # finished придёт из потока воркера
+        else:
+            self.jobFinished.emit(job.id, False)
+        self._emit_aggregate()
+
+    def cancel_proxy_jobs(self, video_ids: list[int]):
+        """Отменяет незавершённые прокси удаляемых видео."""
+        ids = set(video_ids)
+        for job in list(self.jobs.values()):
+            if job.kind == ConversionJob.PROXY and job.params.get("video_id") in ids:
+                self.cancel_job(job.id)
+
+    def set_paused(self, paused: bool):
+        """Пауза всей очереди: новые задания не стартуют, работающие приостанавливаются."""
+        self.paused = paused
+        for job in self.jobs.values():
+            # Задания, приостановленные по отдельности, остаются на паузе;
+            # не умеющие останавливаться доработают, новые не стартуют
+            if job.worker is not None and job.status == ConversionJob.RUNNING and job.worker.can_pause:
+                job.worker.pause() if paused else job.worker.resume()
+        self._dispatch()
+
+    def running_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == ConversionJob.RUNNING)
+
+    def aggregate_progress(self) -> int:
+        """Средний прогресс без отменённых; задание с ошибкой закончено – считается за 100%,
+        иначе общий прогресс не дошёл бы до конца."""
+        active = [job for job in self.jobs.values() if job.status != ConversionJob.CANCELLED]
+        if not active:
+            return 0
+        return int(sum(100 if job.is_finished else job.progress for job in active) / len(active))
+
+    def shutdown(self):
+        """Останавливает работающие задания; в базе они остаются в очереди до следующего запуска."""
+        for job in self.jobs.values():
+            if job.worker is not None:
+                try:
+                    job.worker.finished.disconnect()
+                except TypeError:
+                    pass
+                job.worker.cancel()
+        for job in self.jobs.values():
+            if job.thread is not None:
+                job.thread.quit()
+                job.thread.wait()
+
+    # ---------- Внутреннее ----------
+
+    def _set_status(self, job: ConversionJob, status: str):
+        job.status = status
+        job.resume_pending = False
+        self._db.update_conversion_job(job.id, status)
+        self.jobChanged.emit(job.id)
+
+    def _emit_aggregate(self):
+        self.aggregateProgressChanged.emit(self.aggregate_progress())
+
+    def _dispatch(self):
+        if self.paused:
+            return
+        free = self.max_parallel - self.running_count()
+        # Сначала продолжаем приостановленные: их декодер и буферы уже созданы
+        for job in self.jobs.values():
+            if free <= 0:
+                return
+            if job.resume_pending and job.worker is not None:
+                job.worker.resume()
+                self._set_status(job, ConversionJob.RUNNING)
+                free -= 1
+        for job in self.jobs.values():
+            if free <= 0:
+                break
+            if job.status == ConversionJob.QUEUED and job.worker is None:
+                self._start_job(job)
+                free -= 1
+
+    def _start_job(self, job: ConversionJob):
+        job.progress = 0
+        if job.kind == ConversionJob.PROXY:
+            # Прокси – всегда через OpenCV: уменьшение и прореживание кадров идут в конвейере воркера
+            job.worker = CVConvertWorker(job.input_path, job.output_path,
+                                         transform=proxy_transform(job.params["height"]),
+                                         output_fps=job.params.get("fps"))
+        else:
+            extra_outputs = [OutputTarget(**target) for target in job.params.get("outputs", [])]
+            job.worker = create_convert_worker(job.input_path, job.output_path, extra_outputs=extra_outputs)
+        job.thread = QThread()
+        job.thread.setObjectName(f"conversion-job-{job.id}")
+        job.worker.moveToThread(job.thread)
+        job.thread.started.connect(job.worker.run)
+        # Воркер может быть удалён раньше, чем GUI-поток обработает его сигнал, поэтому
+        # id задания добавляется прямо в потоке воркера и дальше идёт нашими сигналами
+        direct = Qt.ConnectionType.DirectConnection
+        job_id = job.id
+        job.worker.progressChanged.connect(lambda percent, eta, speed: self._jobProgress.emit(job_id, percent, eta, speed), direct)
+        job.worker.stageThroughputChanged.connect(lambda stages: self._jobStages.emit(job_id, stages), direct)
+        job.worker.finished.connect(lambda success, _out: self._jobDone.emit(job_id, success), direct)
+        job.worker.finished.connect(job.thread.quit)
+        job.worker.finished.connect(job.worker.deleteLater)
+        job.thread.finished.connect(job.thread.deleteLater)
+        job.thread.finished.connect(lambda: self._jobThreadFinished.emit(job_id), direct)
+        self._set_status(job, ConversionJob.RUNNING)
+        job.thread.start()
+
+    def _on_progress(self, job_id: int, percent: int, eta: float, speed: float):
+        job = self.jobs[job_id]
+        job.progress = max(percent, 0)
+        job.eta = eta
+        job.speed = speed
+        self.jobChanged.emit(job.id)
+        self._emit_aggregate()
+
+    def _on_stage_throughput(self, job_id: int, stages: dict):
+        self.jobs[job_id].stage_fps = stages
+        self.jobChanged.emit(job_id)
+
+    def _on_finished(self, job_id: int, success: bool):
+        job = self.jobs[job_id]
+        if job.status != ConversionJob.CANCELLED:
+            if success:
+                job.progress = 100
+            self._set_status(job, ConversionJob.DONE if success else ConversionJob.FAILED)
+            if success and job.kind == ConversionJob.PROXY:
+                video_id = job.params["video_id"]
+                if self._db.set_proxy(video_id, job.output_path, job.params["height"], job.params.get("fps")):
+                    self.proxyReady.emit(video_id, job.output_path)
+                else:
+                    # Видео удалили, пока строился прокси – файл ни к чему не привязан
+                    try:
+                        os.remove(job.output_path)
+                    except OSError:
+                        pass
+        self.jobFinished.emit(job.id, success and job.status == ConversionJob.DONE)
+        self._emit_aggregate()
+
+    def _on_thread_finished(self, job_id: int):
+        job = self.jobs[job_id]
+        # Ссылки держим до остановки потока, иначе QThread будет уничтожен во время работы
+        job.worker = None
+        job.thread = None
+        self._dispatch()
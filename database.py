@@ -0,0 +1,400 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import tracing
+
+# Числовые колонки метаданных; строковые duration/resolution остаются для отображения
+VIDEO_COLUMNS = (
+    "title", "duration", "resolution", "file_path",
+    "duration_sec", "width", "height", "fps", "frame_count", "file_size", "mtime", "codec",
+)
+
+# Колонки, по которым разрешена сортировка (подставляются в SQL напрямую)
+SORTABLE_COLUMNS = {"id", "title", "duration_sec", "width", "height", "fps", "file_size", "mtime"}
+
+
+def parse_duration(duration: str | None) -> float | None:
+    """Конвертирует строку вида HH:MM:SS или MM:SS в секунды."""
+    if not duration:
+        return None
+    parts = duration.split(':')
+    try:
+        if len(parts) == 3:
+            h, m, s = parts
+        elif len(parts) == 2:
+            h = 0
+            m, s = parts
+        else:
+            return None
+        return int(h) * 3600 + int(m) * 60 + int(float(s))
+    except ValueError:
+        return None
+
+
+def parse_resolution(resolution: str | None) -> tuple[int | None, int | None]:
+    """Разбирает строку «ШxВ» в (ширина, высота)."""
+    try:
+        w, h = (resolution or "").lower().split("x")
+        return int(w), int(h)
+    except ValueError:
+        return None, None
+
+
+# ---------- Миграции ----------
+# Каждая функция переводит схему с версии N-1 на N; номер хранится в PRAGMA user_version.
+
+def _migrate_v1(cursor: sqlite3.Cursor):
+    """Исходная таблица: только строки для отображения."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS videos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            duration TEXT,
+            resolution TEXT,
+            file_path TEXT
+        )
+    """)
+
+
+def _migrate_v2(cursor: sqlite3.Cursor):
+    """Типизированные колонки метаданных, индексы и заполнение для старых записей."""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(videos)")}
+    for name, sql_type in (
+        ("duration_sec", "REAL"),
+        ("width", "INTEGER"),
+        ("height", "INTEGER"),
+        ("fps", "REAL"),
+        ("frame_count", "INTEGER"),
+        ("file_size", "INTEGER"),
+        ("mtime", "REAL"),
+        ("codec", "TEXT"),
+    ):
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE videos ADD COLUMN {name} {sql_type}")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_videos_duration ON videos(duration_sec)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_videos_resolution ON videos(height, width)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_videos_file_size ON videos(file_size)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_videos_mtime ON videos(mtime)")
+
+    # Бэкфилл: длительность и разрешение восстанавливаем из строк, размер и mtime – через stat.
+    # fps, frame_count и codec без повторного чтения файла не узнать – остаются NULL.
+    rows = cursor.execute("SELECT id, duration, resolution, file_path FROM videos").fetchall()
+    updates = []
+    for video_id, duration, resolution, file_path in rows:
+        width, height = parse_resolution(resolution)
+        try:
+            st = os.stat(file_path)
+            file_size, mtime = st.st_size, st.st_mtime
+        except (OSError, TypeError, ValueError):
+            file_size = mtime = None
+        updates.append((parse_duration(duration), width, height, file_size, mtime, video_id))
+    cursor.executemany(
+        "UPDATE videos SET duration_sec = ?, width = ?, height = ?, file_size = ?, mtime = ? WHERE id = ?",
+        updates,
+    )
+
+
+def _migrate_v3(cursor: sqlite3.Cursor):
+    """Индекс по пути: удаление и поиск по file_path без полного просмотра таблицы."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_videos_file_path ON videos(file_path)")
+
+
+def _fts_row(video_id: int, title: str | None, file_path: str | None) -> tuple:
+    """Строка полнотекстового индекса: название, имя файла и папка."""
+    file_path = file_path or ""
+    return video_id, title or "", os.path.basename(file_path), os.path.dirname(file_path)
+
+
+def _migrate_v4(cursor: sqlite3.Cursor):
+    """Полнотекстовый индекс FTS5 по названию, имени файла и папке.
+
+    rowid индекса совпадает с videos.id. Вставку и обновление выполняет
+    VideoDatabase (имя файла и папка вычисляются в Python), удаление –
+    триггер, чтобы индекс не отставал при любом DELETE.
+    """
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+            title, file_name, folder,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '1 2 3'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS videos_fts_delete AFTER DELETE ON videos BEGIN
+            DELETE FROM videos_fts WHERE rowid = old.id;
+        END
+    """)
+    rows = cursor.execute("SELECT id, title, file_path FROM videos").fetchall()
+    cursor.executemany(
+        "INSERT INTO videos_fts (rowid, title, file_name, folder) VALUES (?, ?, ?, ?)",
+        [_fts_row(*row) for row in rows],
+    )
+
+
+def _migrate_v5(cursor: sqlite3.Cursor):
+    """Очередь конвертации: задания переживают перезапуск приложения."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS conversion_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            input_path TEXT NOT NULL,
+            output_path TEXT NOT NULL,
+            format TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            created REAL NOT NULL DEFAULT (julianday('now'))
+        )
+    """)
+
+
+def _migrate_v6(cursor: sqlite3.Cursor):
+    """Прокси – уменьшенные копии для воспроизведения; задания очереди получают тип и параметры."""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(conversion_jobs)")}
+    if "kind" not in existing:
+        cursor.execute("ALTER TABLE conversion_jobs ADD COLUMN kind TEXT NOT NULL DEFAULT 'convert'")
+    if "params" not in existing:
+        cursor.execute("ALTER TABLE conversion_jobs ADD COLUMN params TEXT")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS proxies (
+            video_id INTEGER PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            height INTEGER,
+            fps REAL
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS proxies_video_delete AFTER DELETE ON videos BEGIN
+            DELETE FROM proxies WHERE video_id = old.id;
+        END
+    """)
+
+
+def _migrate_v7(cursor: sqlite3.Cursor):
+    """Индекс ключевых кадров для перемотки; размер и mtime отсекают устаревшие записи."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS keyframe_index (
+            file_path TEXT PRIMARY KEY,
+            file_size INTEGER,
+            mtime REAL,
+            times TEXT NOT NULL
+        )
+    """)
+
+
+MIGRATIONS = [_migrate_v1, _migrate_v2, _migrate_v3, _migrate_v4, _migrate_v5, _migrate_v6, _migrate_v7]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+@tracing.traced(cat="sqlite")
+def migrate(connection: sqlite3.Connection) -> int:
+    """Применяет недостающие миграции в одной транзакции и возвращает итоговую версию схемы."""
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return version
+    with connection:
+        cursor = connection.cursor()
+        # Явный BEGIN: иначе sqlite3 выполняет DDL вне транзакции
+        cursor.execute("BEGIN")
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            MIGRATIONS[target - 1](cursor)
+        # PRAGMA не принимает параметры, версия – наше собственное целое число
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return SCHEMA_VERSION
+
+
+# ---------- Запросы ----------
+
+def select_videos(
+    connection: sqlite3.Connection,
+    order_by: str = "id",
+    descending: bool = False,
+    min_duration: float | None = None,
+    max_duration: float | None = None,
+    min_height: int | None = None,
+    max_height: int | None = None,
+) -> list[tuple]:
+    """Возвращает строки (id, *VIDEO_COLUMNS) с фильтрацией и сортировкой на стороне SQLite."""
+    if order_by not in SORTABLE_COLUMNS:
+        raise ValueError(f"Недопустимая колонка сортировки: {order_by}")
+    where, params = [], []
+    for column, op, value in (
+        ("duration_sec", ">=", min_duration),
+        ("duration_sec", "<=", max_duration),
+        ("height", ">=", min_height),
+        ("height", "<=", max_height),
+    ):
+        if value is not None:
+            where.append(f"{column} {op} ?")
+            params.append(value)
+    sql = f"SELECT id, {', '.join(VIDEO_COLUMNS)} FROM videos"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {order_by} {'DESC' if descending else 'ASC'}"
+    return connection.execute(sql, params).fetchall()
+
+
+def fts_query(text: str) -> str | None:
+    """Превращает ввод пользователя в запрос FTS5: все слова, каждое как префикс."""
+    tokens = re.findall(r"\w+", text.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_video_ids(connection: sqlite3.Connection, text: str, page_size: int = 500):
+    """Генератор страниц id, упорядоченных по релевантности (совпадение в названии весит больше)."""
+    query = fts_query(text)
+    if query is None:
+        return
+    cursor = connection.execute(
+        "SELECT rowid FROM videos_fts WHERE videos_fts MATCH ? ORDER BY bm25(videos_fts, 10.0, 5.0, 1.0)",
+        (query,),
+    )
+    while True:
+        page = cursor.fetchmany(page_size)
+        if not page:
+            return
+        yield [row[0] for row in page]
+
+
+# ---------- Слой доступа к данным ----------
+
+@tracing.trace_methods("sqlite")
+class VideoDatabase:
+    """Одно долгоживущее соединение с базой библиотеки.
+
+    Журнал WAL и ``synchronous=NORMAL`` убирают fsync на каждую запись,
+    а массовые операции выполняются одной транзакцией. SQL-тексты
+    постоянны, поэтому sqlite3 переиспользует подготовленные выражения
+    из своего кэша. Доступ сериализован блокировкой – объект можно
+    использовать из фоновых потоков.
+    """
+
+    _INSERT_SQL = (
+        f"INSERT INTO videos ({', '.join(VIDEO_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(VIDEO_COLUMNS))})"
+    )
+    _FTS_INSERT_SQL = "INSERT INTO videos_fts (rowid, title, file_name, folder) VALUES (?, ?, ?, ?)"
+    # При повторном сканировании обновляем метаданные, но не название – его мог задать пользователь
+    _UPDATE_COLUMNS = tuple(c for c in VIDEO_COLUMNS if c not in ("title", "file_path"))
+    _UPDATE_SQL = f"UPDATE videos SET {', '.join(c + ' = ?' for c in _UPDATE_COLUMNS)} WHERE file_path = ?"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, cached_statements=128)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        migrate(self._conn)
+
+    @contextmanager
+    def transaction(self):
+        """Группирует несколько операций в одну транзакцию (один commit)."""
+        with self._lock:
+            with self._conn:
+                yield self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def select_videos(self, **filters) -> list[tuple]:
+        """См. модульную функцию ``select_videos``."""
+        with self._lock:
+            return select_videos(self._conn, **filters)
+
+    def insert_many(self, rows: list[tuple]) -> list[int]:
+        """Добавляет строки VIDEO_COLUMNS одной транзакцией и возвращает их id."""
+        ids = []
+        title_i, path_i = VIDEO_COLUMNS.index("title"), VIDEO_COLUMNS.index("file_path")
+        with self.transaction() as conn:
+            for row in rows:
+                video_id = conn.execute(self._INSERT_SQL, row).lastrowid
+                conn.execute(self._FTS_INSERT_SQL, _fts_row(video_id, row[title_i], row[path_i]))
+                ids.append(video_id)
+        return ids
+
+    def update_many(self, rows: list[tuple]) -> None:
+        """Обновляет метаданные по file_path; строки – в порядке VIDEO_COLUMNS."""
+        index = {column: i for i, column in enumerate(VIDEO_COLUMNS)}
+        params = [
+            tuple(row[index[c]] for c in self._UPDATE_COLUMNS) + (row[index["file_path"]],)
+            for row in rows
+        ]
+        with self.transaction() as conn:
+            conn.executemany(self._UPDATE_SQL, params)
+
+    def delete_many_ids(self, ids: list[int]) -> None:
+        """Удаляет записи по первичному ключу одной транзакцией."""
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM videos WHERE id = ?", ((video_id,) for video_id in ids))
+
+    # ---------- Очередь конвертации ----------
+
+    def insert_conversion_job(self, input_path: str, output_path: str, fmt: str,
+                              kind: str = "convert", params: dict | None = None) -> int:
+        with self.transaction() as conn:
+            return conn.execute(
+                "INSERT INTO conversion_jobs (input_path, output_path, format, kind, params) VALUES (?, ?, ?, ?, ?)",
+                (input_path, output_path, fmt, kind, json.dumps(params) if params else None),
+            ).lastrowid
+
+    def update_conversion_job(self, job_id: int, status: str) -> None:
+        with self.transaction() as conn:
+            conn.execute("UPDATE conversion_jobs SET status = ? WHERE id = ?", (status, job_id))
+
+    def load_conversion_jobs(self) -> list[tuple]:
+        """Удаляет завершённые задания и возвращает оставшиеся
+        (id, input_path, output_path, format, status, kind, params)."""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM conversion_jobs WHERE status IN ('done', 'failed', 'cancelled')")
+            rows = conn.execute(
+                "SELECT id, input_path, output_path, format, status, kind, params FROM conversion_jobs ORDER BY id"
+            ).fetchall()
+        return [row[:-1] + (json.loads(row[-1]) if row[-1] else {},) for row in rows]
+
+    # ---------- Прокси ----------
+
+    def set_proxy(self, video_id: int, file_path: str, height: int | None, fps: float | None) -> bool:
+        """Связывает прокси с видео; False – видео уже удалено, связь не записана."""
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR REPLACE INTO proxies (video_id, file_path, height, fps) "
+                "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM videos WHERE id = ?)",
+                (video_id, file_path, height, fps, video_id),
+            )
+            return cursor.rowcount > 0
+
+    def delete_proxies(self, video_ids: list[int]) -> None:
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM proxies WHERE video_id = ?", ((video_id,) for video_id in video_ids))
+
+    def select_proxies(self) -> dict[int, str]:
+        """video_id -> путь прокси."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT video_id, file_path FROM proxies"))
+
+    # ---------- Индекс ключевых кадров ----------
+
+    def set_keyframe_index(self, file_path: str, file_size: int, mtime: float, times: list[float]) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO keyframe_index (file_path, file_size, mtime, times) VALUES (?, ?, ?, ?)",
+                (file_path, file_size, mtime, json.dumps(times)),
+            )
+
+    def select_keyframe_index(self, file_path: str, file_size: int, mtime: float) -> list[float] | None:
+        """Времена ключевых кадров (с) или None, если индекса нет или файл с тех пор изменился."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT times FROM keyframe_index WHERE file_path = ? AND file_size = ? AND mtime = ?",
+                (file_path, file_size, mtime),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete_keyframe_index(self, file_paths: list[str]) -> None:
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM keyframe_index WHERE file_path = ?", ((path,) for path in file_paths))
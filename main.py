@@ -1,82 +1,438 @@
 import sys
 import os
-import sqlite3
-import subprocess
+import hashlib
+import logging
 import datetime
 from PyQt6.QtWidgets import (
-    QMainWindow, QLineEdit, QPushButton, QListWidget, QListWidgetItem, QListView, QMessageBox,
+    QMainWindow, QLineEdit, QPushButton, QListView, QMessageBox,
     QApplication, QFileDialog, QLabel, QWidget, QVBoxLayout, QHBoxLayout, QStyle, QMenu, QStyledItemDelegate, QAbstractItemView,
-    QComboBox, QProgressBar, QDialog
+    QComboBox, QProgressBar, QDialog, QInputDialog, QTableWidget, QTableWidgetItem, QHeaderView,
+    QCheckBox, QTimeEdit
 )
-from PyQt6.QtCore import Qt, QAbstractTableModel, QVariant, QModelIndex, QUrl, QSize, QEvent, QRect, QRectF, QThread, pyqtSignal, QObject
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QUrl, QSize, QPoint, QEvent, QRect, QRectF, QThread, QThreadPool, QTimer, QTime, pyqtSignal
 from PyQt6.QtGui import (
-    QDesktopServices, QIcon, QPixmap, QImage, QAction, QPainter, QColor, QPainterPath, QFontMetrics
+    QDesktopServices, QIcon, QImage, QAction, QPainter, QColor, QPainterPath, QFontMetrics
 )
-from videoplayer import VideoPlayer
+from videoplayer import PlayerPool
+from thumbcache import ThumbnailCache, ThumbnailMemoryCache, sprite_tile
+import database
+from workers import ThumbnailLoader, ProbePool, FolderScanWorker, SearchWorker, path_key
+import probe
+import tracing
+from stallwatch import StallWatchdog
+from conversion import (
+    CVConvertWorker, FFmpegConvertWorker, ConversionJob, ConversionQueue, OutputTarget, FORMATS,
+    create_convert_worker, ffmpeg_path, ffprobe_path, keyframe_times,
+)
+
+DB_PATH = "video_library.db"
+VIDEO_EXTENSIONS = ("mp4", "avi", "mkv", "flv", "ts", "mts")
+# Кэш превью лежит рядом с базой, чтобы не декодировать видео при каждом запуске
+THUMBNAIL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "thumbnails")
+# Бюджет памяти под превью сетки; вытесненные перечитываются из дискового кэша
+THUMBNAIL_MEMORY_BUDGET = 64 * 1024 * 1024
+# Листы кадров для перемотки (~50 кадров 160x90 на видео) – отдельный, меньший бюджет
+SPRITE_MEMORY_BUDGET = 32 * 1024 * 1024
+# Прокси для плеера: уменьшенные копии тяжёлых исходников, тоже рядом с базой
+PROXY_DIR = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "proxies")
+PROXY_HEIGHT = 540
+PROXY_MAX_FPS = 30.0
+# Не больше стольких окон плеера одновременно; при открытии следующего закрывается самое старое
+MAX_OPEN_PLAYERS = 4
+# Отладка плеера: строка замеров (первый кадр, перемотка, зависания) под видео и их запись в лог
+PLAYER_DEBUG = os.environ.get("VIDEOTEKA_PLAYER_DEBUG") == "1"
+# Прогрев: видео под курсором (или выбранное кликом) открывается заранее в скрытом плеере
+PREWARM_PLAYER = os.environ.get("VIDEOTEKA_PREWARM") == "1"
+PREWARM_DELAY_MS = 300
+# Сторож зависаний GUI-потока: зависания дольше порога – в лог со стеком, гистограмма задержек – в отчёт
+STALL_WATCHDOG = os.environ.get("VIDEOTEKA_WATCHDOG") == "1"
+STALL_THRESHOLD_MS = 200
+STALL_REPORT_PATH = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "stalls.txt")
 
 class Video:
-    def __init__(self, title, duration, resolution, file_path, thumbnail: QPixmap | None = None):
+    def __init__(self, title, duration, resolution, file_path, *,
+                 duration_sec: float | None = None, width: int | None = None, height: int | None = None,
+                 fps: float | None = None, frame_count: int | None = None, file_size: int | None = None,
+                 mtime: float | None = None, codec: str | None = None):
+        self.id: int | None = None  # videos.id, появляется после записи в базу
         self.title = title
         self.duration = duration
         self.resolution = resolution
         self.file_path = file_path
-        self.thumbnail = thumbnail
+        # Сами пиксели лежат в общем ThumbnailMemoryCache, у видео – только ключ
+        self.thumbnail_key = file_path
+        # Числовые метаданные – для сортировки и фильтрации средствами SQLite
+        self.duration_sec = duration_sec
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_count = frame_count
+        self.file_size = file_size
+        self.mtime = mtime
+        self.codec = codec
+        # Путь уменьшенной копии для воспроизведения (таблица proxies), если она создана
+        self.proxy_path: str | None = None
+
+    @classmethod
+    def from_row(cls, row: tuple) -> 'Video':
+        """Создаёт Video из строки (id, *database.VIDEO_COLUMNS)."""
+        video_id, title, duration, resolution, file_path, *rest = row
+        video = cls(title, duration, resolution, file_path, **dict(zip(database.VIDEO_COLUMNS[4:], rest)))
+        video.id = video_id
+        return video
+
+    def to_row(self) -> tuple:
+        return tuple(getattr(self, column) for column in database.VIDEO_COLUMNS)
+
+
+STAGE_NAMES = {"read": "чтение", "transform": "обработка", "write": "запись"}
+
+
+def format_stage_throughput(stages: dict[str, float]) -> str:
+    """«чтение 950 к/с · запись 310 к/с», узкое место помечено звёздочкой."""
+    if not stages:
+        return ""
+    slowest = min(stages, key=stages.get)
+    parts = []
+    for name, fps in stages.items():
+        # Стадии выходов при нескольких файлах: «write mp4»
+        base, _, suffix = name.partition(" ")
+        label = STAGE_NAMES.get(base, base) + (f" {suffix.upper()}" if suffix else "")
+        parts.append(f"{label} {fps:.0f} к/с{'*' if name == slowest and len(stages) > 1 else ''}")
+    return " · ".join(parts)
+
+
+def format_eta(seconds: float) -> str:
+    """ММ:СС или Ч:ММ:СС для оставшегося времени."""
+    mins, secs = divmod(int(seconds), 60)
+    hours, mins = divmod(mins, 60)
+    return f"{hours}:{mins:02d}:{secs:02d}" if hours else f"{mins:02d}:{secs:02d}"
+
+
+def format_duration(duration_sec: float | None) -> str | None:
+    """Секунды -> «MM:SS» или «HH:MM:SS»."""
+    if duration_sec is None:
+        return None
+    m, s = divmod(int(duration_sec + 0.5), 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
 
 
-class VideoTableModel(QAbstractTableModel):
-    def __init__(self, videos):
-        super().__init__()
-        self.videos = videos
-        # Иконка ▶ для списка
-        self.play_icon = QApplication.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay)
+class VideoListModel(QAbstractListModel):
+    """Модель библиотеки для сетки превью.
 
-    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
-        return len(self.videos)
+    Элементы не создаются заранее: представление запрашивает данные только
+    для видимых строк, уменьшенная иконка строится при первом запросе
+    DecorationRole и кэшируется. Добавление и удаление сообщают о
+    затронутых строках, поэтому остальная сетка не перестраивается.
+    """
 
-    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
-        return 1  # только название
+    MAX_REMOVE_RANGES = 64  # больше диапазонов – удаляем сбросом модели
+
+    def __init__(self, thumbnails: ThumbnailMemoryCache, videos: list['Video'] | None = None, parent=None):
+        super().__init__(parent)
+        self.videos: list[Video] = list(videos or [])
+        self._thumbnails = thumbnails
+        self._placeholder_icon = QApplication.style().standardIcon(QStyle.StandardPixmap.SP_FileIcon)
+        self._rows_by_path: dict[str, list[int]] = {}
+        # path_key -> строки; строится при первом обращении (нужен только при пересканировании)
+        self._rows_by_key: dict[str, list[int]] | None = None
+        self._by_id: dict[int, Video] = {}
+        self._reindex()
+
+    def _reindex(self):
+        self._rows_by_path = {}
+        self._rows_by_key = None
+        self._by_id = {}
+        for row, video in enumerate(self.videos):
+            self._rows_by_path.setdefault(video.file_path, []).append(row)
+            if video.id is not None:
+                self._by_id[video.id] = video
+
+    # ---------- Интерфейс Qt ----------
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.videos)
 
-    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> QVariant:
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
         video = self.videos[index.row()]
+        if role == Qt.ItemDataRole.UserRole:
+            return video
         if role == Qt.ItemDataRole.DisplayRole:
-            return video.title
-        if role == Qt.ItemDataRole.DecorationRole and index.column() == 0:
-            return self.play_icon
+            return f"{video.title}\n{video.duration}"
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self._icon_for(video)
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignHCenter
+        if role == Qt.ItemDataRole.SizeHintRole:
+            return QSize(160, 150)
         return None
 
-    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> QVariant:
-        return None  # скрываем заголовки
+    def _icon_for(self, video: 'Video') -> QIcon:
+        """Иконка элемента: превью из кэша в памяти, если оно там есть, иначе заглушка."""
+        pixmap = self._thumbnails.get(video.thumbnail_key)
+        if pixmap is None:
+            return self._placeholder_icon
+        return QIcon(pixmap)
+
+    # ---------- Изменение содержимого ----------
+
+    def set_videos(self, videos: list['Video']):
+        self.beginResetModel()
+        self.videos = list(videos)
+        self._reindex()
+        self.endResetModel()
+
+    def append_videos(self, videos: list['Video']):
+        if not videos:
+            return
+        first = len(self.videos)
+        self.beginInsertRows(QModelIndex(), first, first + len(videos) - 1)
+        for row, video in enumerate(videos, start=first):
+            self.videos.append(video)
+            self._rows_by_path.setdefault(video.file_path, []).append(row)
+            if self._rows_by_key is not None:
+                self._rows_by_key.setdefault(path_key(video.file_path), []).append(row)
+            if video.id is not None:
+                self._by_id[video.id] = video
+        self.endInsertRows()
+
+    def remove_videos(self, videos: list['Video']):
+        """Удаляет видео, сообщая представлению о непрерывных диапазонах строк (с конца)."""
+        targets = {id(v) for v in videos}
+        rows = [row for row, video in enumerate(self.videos) if id(video) in targets]
+        if not rows:
+            return
+        # Группируем в непрерывные диапазоны и удаляем с конца, чтобы индексы не сдвигались
+        ranges = []
+        start = prev = rows[0]
+        for row in rows[1:]:
+            if row != prev + 1:
+                ranges.append((start, prev))
+                start = row
+            prev = row
+        ranges.append((start, prev))
+        if len(ranges) > self.MAX_REMOVE_RANGES:
+            # Разрозненное выделение: один проход и сброс модели дешевле тысяч сигналов removeRows
+            self.beginResetModel()
+            self.videos[:] = [video for video in self.videos if id(video) not in targets]
+            self._reindex()
+            self.endResetModel()
+            return
+        for first, last in reversed(ranges):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.videos[first:last + 1]
+            self.endRemoveRows()
+        self._reindex()
+
+    def video_changed(self, file_path: str):
+        """Сообщает представлению, что данные (превью, длительность) видео с этим путём обновились."""
+        for row in self._rows_by_path.get(file_path, []):
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def videos_for_path(self, file_path: str) -> list['Video']:
+        return [self.videos[row] for row in self._rows_by_path.get(file_path, [])]
+
+    def videos_for_key(self, key: str) -> list['Video']:
+        """Видео по нормализованному пути ``path_key`` (путь со сканирования может отличаться регистром и слэшами)."""
+        if self._rows_by_key is None:
+            self._rows_by_key = {}
+            for row, video in enumerate(self.videos):
+                self._rows_by_key.setdefault(path_key(video.file_path), []).append(row)
+        return [self.videos[row] for row in self._rows_by_key.get(key, [])]
+
+    def register_ids(self, videos: list['Video']):
+        """Добавляет в индекс id видео, которые только что получили его при записи в базу."""
+        for video in videos:
+            if video.id is not None:
+                self._by_id[video.id] = video
+
+    def videos_by_ids(self, ids: list[int]) -> list['Video']:
+        return [self._by_id[i] for i in ids if i in self._by_id]
 
 
 class VideoLibraryApp(QMainWindow):
+    searchRequested = pyqtSignal(int, str)  # поколение, текст запроса – в поток SearchWorker
+    keyframesReady = pyqtSignal(str, list)  # путь, времена ключевых кадров (с) – из потока индексации
+
     # ---------- Служебные методы ----------
-    def _refresh_table(self, videos):
-        """Совместимость: перенаправляем на обновление списка превью."""
-        self._refresh_list(videos)
-
-    def _refresh_list(self, videos):
-        """Обновляет QListWidget превью."""
-        self.list_widget.clear()
-        self.displayed_videos = list(videos)
-        for video in videos:
-            pixmap = video.thumbnail or QPixmap()
-            if pixmap.isNull():
-                icon = QApplication.style().standardIcon(QStyle.StandardPixmap.SP_FileIcon)
-            else:
-                icon = QIcon(pixmap.scaled(160, 90, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
-            item = QListWidgetItem(icon, f"{video.title}\n{video.duration}")
-            item.setData(Qt.ItemDataRole.UserRole, video)
-            item.setTextAlignment(Qt.AlignmentFlag.AlignHCenter)
-            item.setSizeHint(QSize(160, 150))
-            self.list_widget.addItem(item)
-    def open_selected_video(self, item):
-        """Открывает видеоплеер для выбранного видео из QListWidget."""
-        video: Video | None = item.data(Qt.ItemDataRole.UserRole)
+    @property
+    def video_library(self) -> list['Video']:
+        """Все видео библиотеки. Список принадлежит модели – изменять только через её методы."""
+        return self.video_model.videos
+
+    def _selected_videos(self) -> list['Video']:
+        """Видео, выделенные в сетке (в порядке отображения)."""
+        indexes = sorted(self.list_view.selectionModel().selectedIndexes(), key=lambda i: i.row())
+        return [i.data(Qt.ItemDataRole.UserRole) for i in indexes if i.data(Qt.ItemDataRole.UserRole)]
+
+    # ---------- Фоновая загрузка превью ----------
+    def _schedule_visible_thumbnails(self):
+        """Откладывает пересчёт видимых элементов, чтобы не дёргать пул на каждый шаг прокрутки."""
+        self._visible_timer.start()
+
+    def _visible_rows(self) -> range:
+        """Диапазон строк текущей модели сетки, попадающих в viewport (элементы упорядочены по позиции)."""
+        model = self.list_view.model()
+        count = model.rowCount()
+        if not count:
+            return range(0)
+        viewport_height = self.list_view.viewport().height()
+
+        def first_row_where(predicate):
+            lo, hi = 0, count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if predicate(self.list_view.visualRect(model.index(mid, 0))):
+                    hi = mid
+                else:
+                    lo = mid + 1
+            return lo
+
+        # Пустой прямоугольник – строка ещё не размещена (пакетная раскладка), она заведомо ниже
+        first = first_row_where(lambda r: r.isEmpty() or r.bottom() >= 0)
+        last = first_row_where(lambda r: r.isEmpty() or r.top() > viewport_height)
+        return range(first, last)
+
+    @tracing.traced(cat="ui")
+    def _update_visible_thumbnails(self):
+        """Ставит в очередь превью видимых элементов; остальные задания отменяются."""
+        paths = []
+        for row in self._visible_rows():
+            video: Video | None = self.list_view.model().index(row, 0).data(Qt.ItemDataRole.UserRole)
+            if video is None:
+                continue
+            key = video.thumbnail_key
+            if not self.thumbnails.contains(key) and not self.thumbnails.is_failed(key):
+                paths.append(video.file_path)
+        self.thumb_loader.set_visible(paths)
+
+    def _on_thumbnail_ready(self, file_path: str, image: QImage):
+        # Видео может уже не быть в библиотеке (удалено, пока грузилось превью)
+        videos = self.video_model.videos_for_path(file_path)
+        if not videos:
+            return
+        key = videos[0].thumbnail_key
+        if image.isNull():
+            self.thumbnails.mark_failed(key)
+            return
+        self.thumbnails.put(key, image)
+        self.video_model.video_changed(file_path)
+        self.search_model.video_changed(file_path)
+
+    # ---------- Листы кадров для перемотки ----------
+    def request_sprite(self, file_path: str) -> None:
+        """Ставит лист кадров в фоновую очередь; новый запрос вытесняет прежний ожидающий."""
+        if not self.sprites.contains(file_path) and not self.sprites.is_failed(file_path):
+            self.sprite_loader.set_visible([file_path])
+
+    def _on_sprite_ready(self, file_path: str, image: QImage):
+        if image.isNull():
+            self.sprites.mark_failed(file_path)
+            return
+        if not self.video_model.videos_for_path(file_path):
+            return
+        sheet = self.sprites.put(file_path, image)
+        for player in self.player_pool.open_players:
+            if player.video_data.get("file_path") == file_path:
+                player.set_preview_sprite(sheet)
+        if self._hover_sprite is not None and self._hover_sprite[0] == file_path:
+            self.list_view.viewport().update()
+
+    def _update_hover_sprite(self, pos) -> None:
+        """Запоминает видео под курсором и позицию по ширине превью – делегат рисует кадр листа."""
+        index = self.list_view.indexAt(pos)
+        video: Video | None = index.data(Qt.ItemDataRole.UserRole) if index.isValid() else None
+        hover = None
+        if video is not None:
+            rect = self.list_view.visualRect(index)
+            left = rect.x() + (rect.width() - probe.SPRITE_TILE[0]) // 2
+            fraction = (pos.x() - left) / probe.SPRITE_TILE[0]
+            if 0.0 <= fraction <= 1.0 and pos.y() - rect.y() <= probe.SPRITE_TILE[1]:
+                hover = (video.file_path, fraction)
+                self.request_sprite(video.file_path)
+        if hover != self._hover_sprite:
+            self._hover_sprite = hover
+            self.list_view.itemDelegate().hover_sprite = hover
+            self.list_view.viewport().update()
+
+    # ---------- Индекс ключевых кадров ----------
+    def request_keyframe_index(self, file_path: str) -> list[float] | None:
+        """Индекс из памяти или None; при промахе индекс читается из базы или строится ffprobe в фоне."""
+        if file_path in self._keyframe_index:
+            return self._keyframe_index[file_path]
+        if file_path in self._keyframes_requested or ffprobe_path() is None:
+            return None
+        self._keyframes_requested.add(file_path)
+        db = self.db
+
+        def work():
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                return
+            times = db.select_keyframe_index(file_path, st.st_size, st.st_mtime)
+            if times is None:
+                times = keyframe_times(file_path)
+                if times is None:
+                    return
+                db.set_keyframe_index(file_path, st.st_size, st.st_mtime, times)
+            self.keyframesReady.emit(file_path, times)
+
+        self._keyframe_pool.start(work)
+        return None
+
+    def _on_keyframes_ready(self, file_path: str, times: list):
+        self._keyframes_requested.discard(file_path)
+        self._keyframe_index[file_path] = times
+        for player in self.player_pool.open_players:
+            if player.video_data.get("source_path") == file_path:
+                player.set_keyframes(times)
+
+    def _forget_keyframe_index(self, file_paths: list[str]):
+        for file_path in file_paths:
+            self._keyframe_index.pop(file_path, None)
+            self._keyframes_requested.discard(file_path)
+
+    @staticmethod
+    def _playback_path(video: 'Video') -> str:
+        """Что открывать в плеере: прокси, если он есть, – исходник 4K может не тянуть слабая машина."""
+        if video.proxy_path and os.path.exists(video.proxy_path):
+            return video.proxy_path
+        return video.file_path
+
+    def _schedule_prewarm(self, index: QModelIndex):
+        """Прогрев видео под курсором, если он задержался на карточке дольше PREWARM_DELAY_MS."""
+        video: Video | None = index.data(Qt.ItemDataRole.UserRole) if index.isValid() else None
+        if video is None:
+            self._prewarm_timer.stop()
+            self._prewarm_video = None
+        elif video is not self._prewarm_video:
+            self._prewarm_video = video
+            self._prewarm_timer.start()
+
+    def _prewarm(self):
+        if self._prewarm_video is not None:
+            self.player_pool.prewarm(self._playback_path(self._prewarm_video))
+
+    def open_selected_video(self, index: QModelIndex):
+        """Открывает видеоплеер для видео, по которому дважды кликнули в сетке."""
+        video: Video | None = index.data(Qt.ItemDataRole.UserRole)
         if video is None:
             return
-        player = VideoPlayer()
-        player.setWindowTitle(video.title)
-        player.setSource(QUrl.fromLocalFile(video.file_path))
+        self._prewarm_timer.stop()
+        source_path = self._playback_path(video)
+        # Прогретый плеер для этого файла уже открыл его и показал первый кадр
+        player = self.player_pool.acquire(source_path)
+        player.setWindowTitle(f"{video.title} (прокси)" if source_path != video.file_path else video.title)
+        if player.source_path() != source_path:
+            player.setSource(QUrl.fromLocalFile(source_path))
+            player.preroll()
+        player.mark_opened()
+        player.set_debug(PLAYER_DEBUG)
         player.resize(900, 600)
 
         # Передача метаданных
@@ -85,20 +441,79 @@ class VideoLibraryApp(QMainWindow):
             "duration": video.duration,
             "resolution": video.resolution,
             "file_path": video.file_path,
+            "source_path": source_path,
         }
         player.set_video_data(video_data)
+        player.set_keyframes(self.request_keyframe_index(source_path))
+        sheet = self.sprites.get(video.file_path)
+        if sheet is not None:
+            player.set_preview_sprite(sheet)
+        else:
+            self.request_sprite(video.file_path)
 
-        # Сохраняем ссылку, иначе окно закроется сразу после выхода из функции
-        self.open_players.append(player)
+        # Пул хранит ссылку, пока окно открыто, и забирает плеер обратно при закрытии
         player.show()
+        player.raise_()
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Видеотека")
         # применяем глобальный стиль
         self.apply_styles()
-        self.video_library = []
-        # Храним ссылки на открытые видеоплееры, чтобы они не уничтожались сборщиком
-        self.open_players: list[VideoPlayer] = []
+        # Запускаем первым, чтобы поймать и медленную загрузку библиотеки
+        self._watchdog: StallWatchdog | None = None
+        if STALL_WATCHDOG:
+            self._watchdog = StallWatchdog(STALL_THRESHOLD_MS, parent=self)
+            self._watchdog.start()
+        self.thumbnails = ThumbnailMemoryCache(THUMBNAIL_MEMORY_BUDGET)
+        self.video_model = VideoListModel(self.thumbnails, parent=self)
+        # Результаты поиска – отдельная модель, наполняемая по мере выдачи FTS в порядке релевантности
+        self.search_model = VideoListModel(self.thumbnails, parent=self)
+        # Окна плееров переиспользуются: закрытые освобождают медиа и ждут следующего открытия
+        self.player_pool = PlayerPool(MAX_OPEN_PLAYERS)
+        self.db: database.VideoDatabase | None = None
+        self.thumb_cache = ThumbnailCache(THUMBNAIL_CACHE_DIR)
+        self.thumb_loader = ThumbnailLoader(self.load_thumbnail_image, parent=self)
+        self.thumb_loader.thumbnailReady.connect(self._on_thumbnail_ready)
+        self._visible_timer = QTimer(self)
+        self._visible_timer.setSingleShot(True)
+        self._visible_timer.setInterval(50)
+        self._visible_timer.timeout.connect(self._update_visible_thumbnails)
+        # Листы кадров строятся по требованию (наведение на карточку, открытие плеера) одним потоком
+        self.sprites = ThumbnailMemoryCache(SPRITE_MEMORY_BUDGET, display_size=None)
+        self.sprite_loader = ThumbnailLoader(self.load_sprite_image, max_workers=1, parent=self)
+        self.sprite_loader.thumbnailReady.connect(self._on_sprite_ready)
+        self._hover_sprite: tuple[str, float] | None = None
+        # Индекс ключевых кадров для перемотки в плеере: ffprobe в отдельном потоке, результат – в базе
+        self._keyframe_pool = QThreadPool(self)
+        self._keyframe_pool.setMaxThreadCount(1)
+        self._keyframe_index: dict[str, list[float]] = {}
+        self._keyframes_requested: set[str] = set()
+        self.keyframesReady.connect(self._on_keyframes_ready)
+        self._prewarm_video: Video | None = None
+        self._prewarm_timer = QTimer(self)
+        self._prewarm_timer.setSingleShot(True)
+        self._prewarm_timer.setInterval(PREWARM_DELAY_MS)
+        self._prewarm_timer.timeout.connect(self._prewarm)
+        # Импорт: метаданные и превью за один проход, параллельно по ядрам
+        self.probe_pool = ProbePool(parent=self)
+        self.probe_pool.probed.connect(self._on_video_probed)
+        self.probe_pool.progressChanged.connect(self._on_import_progress)
+        self.probe_pool.finished.connect(self._on_import_finished)
+        self._import_overrides: dict[str, tuple[str, str, str]] = {}
+        self._pending_db_videos: list[Video] = []
+        # Пересканированные видео и их устаревшие прокси – пишутся в базу вместе с новыми
+        self._pending_db_updates: list[Video] = []
+        self._stale_proxies: list[tuple[int, str]] = []  # id видео, путь прокси
+        # Пути (path_key), которые уже есть в библиотеке и пересканируются из-за изменения файла
+        self._reprobe_keys: set[str] = set()
+        # Время извлечения превью по файлам текущего импорта – итог в строке состояния
+        self._import_thumb_times: list[tuple[float, str]] = []
+        self._scan_thread: QThread | None = None
+        self._scan_worker: FolderScanWorker | None = None
+        self._scan_running = False
+        # Один поток для фоновых записей в базу: операции выполняются в порядке постановки
+        self._io_pool = QThreadPool(self)
+        self._io_pool.setMaxThreadCount(1)
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
@@ -120,6 +535,9 @@ class VideoLibraryApp(QMainWindow):
         add_button = QPushButton("Добавить")
         add_button.setIcon(QIcon("icons/add.svg"))
         add_button.clicked.connect(self.add_video)
+        add_folder_button = QPushButton("Добавить папку")
+        add_folder_button.setIcon(QIcon("icons/add.svg"))
+        add_folder_button.clicked.connect(self.add_folder)
         delete_button = QPushButton("Удалить")
         delete_button.setIcon(QIcon("icons/delete.svg"))
         delete_button.clicked.connect(self.delete_selected_videos)
@@ -128,43 +546,72 @@ class VideoLibraryApp(QMainWindow):
         convert_button.setIcon(QIcon("icons/reverse.svg"))
         convert_button.clicked.connect(self.convert_selected_video)
 
+        queue_button = QPushButton("Очередь")
+        queue_button.setIcon(QIcon("icons/reverse.svg"))
+        queue_button.clicked.connect(self.show_conversion_queue)
+
         # Выравниваем текст и иконки по левому краю
-        for btn in (add_button, delete_button, convert_button):
+        for btn in (add_button, add_folder_button, delete_button, convert_button, queue_button):
             btn.setStyleSheet("text-align: left; padding-left: 8px;")
 
         sidebar.addWidget(add_button)
+        sidebar.addWidget(add_folder_button)
         sidebar.addWidget(delete_button)
         sidebar.addWidget(convert_button)
+        sidebar.addWidget(queue_button)
         sidebar.addStretch()
 
         # Поиск
         self.search_line_edit = QLineEdit()
         self.search_line_edit.setPlaceholderText("Поиск видео")
-        self.search_line_edit.textChanged.connect(self.filter_videos)
+        self.search_line_edit.textChanged.connect(self._schedule_search)
         right_panel.addWidget(self.search_line_edit)
-
-        # Список превью
-        self.list_widget = QListWidget()
-        self.list_widget.setViewMode(QListView.ViewMode.IconMode)
-        self.list_widget.setIconSize(QSize(160, 90))
-        self.list_widget.setResizeMode(QListWidget.ResizeMode.Adjust)
-        self.list_widget.setMovement(QListView.Movement.Static)
-        self.list_widget.setSpacing(10)
+        # Дебаунс: запрос уходит, когда пользователь сделал паузу в наборе
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        self._search_timer.timeout.connect(self.filter_videos)
+        self._search_generation = 0
+        self._search_page_generation = 0  # поколение, чья первая страница уже показана
+
+        # Сетка превью: QListView поверх video_model; при поиске представление переключается
+        # на search_model, которую страницами заполняют результаты SearchWorker
+        self.list_view = QListView()
+        self.list_view.setModel(self.video_model)
+        self.list_view.setViewMode(QListView.ViewMode.IconMode)
+        self.list_view.setIconSize(QSize(160, 90))
+        self.list_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.list_view.setMovement(QListView.Movement.Static)
+        self.list_view.setSpacing(10)
+        # Все элементы одного размера – представление не опрашивает sizeHint каждой строки
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setLayoutMode(QListView.LayoutMode.Batched)
         # Разрешаем множественное выделение (Ctrl, Shift, рамкой)
-        self.list_widget.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
-        self.list_widget.setMouseTracking(True)
-        self.list_widget.itemDoubleClicked.connect(self.open_selected_video)
+        self.list_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.list_view.setMouseTracking(True)
+        self.list_view.doubleClicked.connect(self.open_selected_video)
+        if PREWARM_PLAYER:
+            self.list_view.clicked.connect(self._schedule_prewarm)
         # Контекстное меню ПКМ
-        self.list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.list_widget.customContextMenuRequested.connect(self.show_context_menu)
+        self.list_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.list_view.customContextMenuRequested.connect(self.show_context_menu)
         # Снятие выделения по клику в пустой области
-        self.list_widget.viewport().installEventFilter(self)
+        self.list_view.viewport().installEventFilter(self)
         # Кастомный делегат для рисования текста с разным стилем
-        self.list_widget.setItemDelegate(VideoItemDelegate(self.list_widget))
-        right_panel.addWidget(self.list_widget)
-
-        # Отдельный список отображаемых видео (для фильтрации)
-        self.displayed_videos: list[Video] = []
+        self.list_view.setItemDelegate(VideoItemDelegate(self.sprites, self.list_view))
+        # При прокрутке, изменении размера и содержимого пересчитываем, какие превью нужны в первую очередь
+        self.list_view.verticalScrollBar().valueChanged.connect(self._schedule_visible_thumbnails)
+        self.list_view.verticalScrollBar().rangeChanged.connect(self._schedule_visible_thumbnails)
+        for model in (self.video_model, self.search_model):
+            model.modelReset.connect(self._schedule_visible_thumbnails)
+            model.rowsInserted.connect(self._schedule_visible_thumbnails)
+            model.rowsRemoved.connect(self._schedule_visible_thumbnails)
+        right_panel.addWidget(self.list_view)
+
+        self.import_progress = QProgressBar()
+        self.import_progress.setFormat("Импорт: %v из %m")
+        self.import_progress.setVisible(False)
+        right_panel.addWidget(self.import_progress)
 
         # Поля ввода для метаданных больше не нужны в новом дизайне, но оставим их скрытыми для авто-заполнения
         self.line_edit_title = QLineEdit()
@@ -176,6 +623,22 @@ class VideoLibraryApp(QMainWindow):
         self.create_database()
         self.load_videos_from_database()
 
+        # Очередь пакетной конвертации; незавершённые задания прошлого запуска продолжаются
+        self.conversion_queue = ConversionQueue(self.db, parent=self)
+        self.conversion_queue.jobFinished.connect(self._on_conversion_job_finished)
+        self.conversion_queue.proxyReady.connect(self._on_proxy_ready)
+        self._queue_dialog: ConversionQueueDialog | None = None
+        self.conversion_queue.start()
+
+        # Поиск выполняется в своём потоке со своим соединением к базе
+        self._search_worker = SearchWorker(DB_PATH)
+        self._search_thread = QThread()
+        self._search_thread.setObjectName("search")
+        self._search_worker.moveToThread(self._search_thread)
+        self.searchRequested.connect(self._search_worker.search)
+        self._search_worker.resultsReady.connect(self._on_search_results)
+        self._search_thread.start()
+
     def create_widgets(self):
         label_title = QLabel("Название:")
         self.line_edit_title = QLineEdit()
@@ -210,86 +673,185 @@ class VideoLibraryApp(QMainWindow):
         self.table_view.doubleClicked.connect(self.open_selected_video)
 
     def create_database(self):
-        connection = sqlite3.connect("video_library.db")
-        cursor = connection.cursor()
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS videos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT,
-                duration TEXT,
-                resolution TEXT,
-                file_path TEXT
-            )
-        """)
-
-        connection.commit()
-        connection.close()
+        """Открывает соединение на всё время работы и обновляет схему до текущей версии."""
+        self.db = database.VideoDatabase(DB_PATH)
 
+    @tracing.traced(cat="sqlite")
     def load_videos_from_database(self):
-        connection = sqlite3.connect("video_library.db")
-        cursor = connection.cursor()
-
-        cursor.execute("SELECT title, duration, resolution, file_path FROM videos")
-        rows = cursor.fetchall()
-
-        for row in rows:
-            title, duration, resolution, file_path = row
-            thumbnail = self.get_video_thumbnail(file_path)
-            video = Video(title, duration, resolution, file_path, thumbnail)
-            self.video_library.append(video)
-
-        self._refresh_table(self.video_library)
-
-        connection.close()
+        # Превью подгрузятся в фоне для видимых элементов
+        videos = [Video.from_row(row) for row in self.db.select_videos()]
+        proxies = self.db.select_proxies()
+        if proxies:
+            for video in videos:
+                video.proxy_path = proxies.get(video.id)
+        self.video_model.set_videos(videos)
 
     def add_video(self):
         """Открывает диалог выбора файлов и добавляет выбранные видео в коллекцию."""
         file_dialog = QFileDialog(self)
-        file_dialog.setNameFilters(["Видеофайлы (*.mp4 *.avi *.mkv *.flv *.ts *.mts)"])
+        file_dialog.setNameFilters([f"Видеофайлы ({' '.join('*.' + ext for ext in VIDEO_EXTENSIONS)})"])
         file_dialog.setFileMode(QFileDialog.FileMode.ExistingFiles)
 
         if file_dialog.exec() == QFileDialog.DialogCode.Accepted:
-            file_paths = file_dialog.selectedFiles()
-            for file_path in file_paths:
-                # Если пользователь заполнил поля – используем их, иначе определяем заголовок по имени файла
-                title = self.line_edit_title.text() or os.path.splitext(os.path.basename(file_path))[0]
-                # Метаданные
-                metadata_duration, metadata_resolution = self.get_video_info(file_path)
-
-                duration = self.line_edit_duration.text() or metadata_duration or "-"
-                resolution = self.line_edit_resolution.text() or metadata_resolution or "-"
-
-                thumbnail = self.get_video_thumbnail(file_path)
-                video = Video(title, duration, resolution, file_path, thumbnail)
-                self.video_library.append(video)
-                self.save_video_to_database(video)
-
-            # Обновляем список
-            self._refresh_table(self.video_library)
+            self.import_files(file_dialog.selectedFiles())
 
         # Очищаем поля ввода
         self.line_edit_title.clear()
         self.line_edit_duration.clear()
         self.line_edit_resolution.clear()
 
-    def save_video_to_database(self, video):
-        connection = sqlite3.connect("video_library.db")
-        cursor = connection.cursor()
+    def add_folder(self):
+        """Рекурсивно добавляет все видео из выбранной папки, пропуская уже известные."""
+        if self._scan_running:
+            QMessageBox.information(self, "Добавить папку", "Сканирование папки уже выполняется.")
+            return
+        root = QFileDialog.getExistingDirectory(self, "Выберите папку с видео")
+        if not root:
+            return
 
-        cursor.execute("""
-            INSERT INTO videos (title, duration, resolution, file_path)
-            VALUES (?, ?, ?, ?)
-        """, (video.title, video.duration, video.resolution, video.file_path))
+        known = {path_key(v.file_path): (v.file_size, v.mtime) for v in self.video_library}
+        self._scan_worker = FolderScanWorker(root, VIDEO_EXTENSIONS, known)
+        self._scan_thread = QThread()
+        self._scan_thread.setObjectName("folder-scan")
+        self._scan_worker.moveToThread(self._scan_thread)
+        self._scan_thread.started.connect(self._scan_worker.run)
+        self._scan_worker.batchFound.connect(self._on_scan_batch)
+        self._scan_worker.finished.connect(self._on_scan_finished)
+        self._scan_worker.finished.connect(self._scan_thread.quit)
+        self._scan_worker.finished.connect(self._scan_worker.deleteLater)
+        self._scan_thread.finished.connect(self._scan_thread.deleteLater)
+        self._scan_thread.finished.connect(self._on_scan_thread_finished)
+        self._scan_running = True
+        self.import_progress.setVisible(True)
+        self._scan_thread.start()
+
+    def _on_scan_batch(self, new_paths: list[str], changed_paths: list[str]):
+        self.import_files(new_paths)
+        self.import_files(changed_paths, reprobe=True)
+
+    def _on_scan_finished(self, total_new: int, total_changed: int):
+        self._scan_running = False
+        if not self.probe_pool.is_busy():
+            self.import_progress.setVisible(False)
+
+    def _on_scan_thread_finished(self):
+        # Ссылки держим до остановки потока, иначе QThread будет уничтожен во время работы
+        self._scan_thread = None
+        self._scan_worker = None
+
+    def import_files(self, file_paths: list[str], reprobe: bool = False):
+        """Отправляет файлы в пул импорта; видео появляются в сетке по мере готовности.
+        При ``reprobe`` файлы уже есть в библиотеке – обновляются их метаданные и превью."""
+        if not file_paths:
+            return
+        if reprobe:
+            self._reprobe_keys.update(path_key(p) for p in file_paths)
+        # Если пользователь заполнил поля – используем их для всех файлов этого пакета
+        overrides = (self.line_edit_title.text(), self.line_edit_duration.text(), self.line_edit_resolution.text())
+        for file_path in file_paths:
+            self._import_overrides[file_path] = overrides
+        self.import_progress.setVisible(True)
+        self.probe_pool.submit(file_paths)
+
+    @tracing.traced(cat="ui")
+    def _on_video_probed(self, result: dict):
+        file_path = result["file_path"]
+        title_override, duration_override, resolution_override = self._import_overrides.pop(file_path, ("", "", ""))
+        # Если поле не заполнено – определяем заголовок по имени файла
+        title = title_override or os.path.splitext(os.path.basename(file_path))[0]
+
+        metadata = {key: result.get(key) for key in database.VIDEO_COLUMNS[4:]}
+        width, height = metadata["width"], metadata["height"]
+        metadata_resolution = f"{width}x{height}" if width and height else None
+        duration = duration_override or format_duration(metadata["duration_sec"]) or "-"
+        resolution = resolution_override or metadata_resolution or "-"
+
+        if result.get("thumbnail_sec") is not None:
+            self._import_thumb_times.append((result["thumbnail_sec"], file_path))
+        thumbnail = None
+        if result["thumbnail"]:
+            self.thumb_cache.put_encoded(file_path, result["thumbnail"])
+            thumbnail = QImage.fromData(result["thumbnail"])
+
+        key = path_key(file_path)
+        if key in self._reprobe_keys:
+            self._reprobe_keys.discard(key)
+            self._update_probed_video(key, duration, resolution, metadata, thumbnail)
+            return
 
-        connection.commit()
-        connection.close()
+        video = Video(title, duration, resolution, file_path, **metadata)
+        if thumbnail is not None:
+            self.thumbnails.put(video.thumbnail_key, thumbnail)
+        self.video_model.append_videos([video])
+        self._pending_db_videos.append(video)
+        if len(self._pending_db_videos) >= 100:
+            self._flush_pending_videos()
+
+    def _update_probed_video(self, key: str, duration: str, resolution: str, metadata: dict, thumbnail: QImage | None):
+        """Обновляет уже известное видео, файл которого изменился на диске."""
+        for video in self.video_model.videos_for_key(key):
+            video.duration = duration
+            video.resolution = resolution
+            for name, value in metadata.items():
+                setattr(video, name, value)
+            self.thumbnails.discard(video.thumbnail_key)
+            if thumbnail is not None:
+                self.thumbnails.put(video.thumbnail_key, thumbnail)
+            self.sprites.discard(video.file_path)
+            # Запись в базе отсечётся сама по размеру и mtime
+            self._forget_keyframe_index([video.file_path])
+            if video.proxy_path and video.id is not None:
+                # Файл изменился – прокси показывал бы старое содержимое
+                self._stale_proxies.append((video.id, video.proxy_path))
+                video.proxy_path = None
+            self._pending_db_updates.append(video)
+            self.video_model.video_changed(video.file_path)
+            self.search_model.video_changed(video.file_path)
+        if len(self._pending_db_updates) >= 100:
+            self._flush_pending_videos()
+
+    def _on_import_progress(self, done: int, total: int):
+        self.import_progress.setRange(0, total)
+        self.import_progress.setValue(done)
+
+    def _on_import_finished(self):
+        self._flush_pending_videos()
+        if self._import_thumb_times:
+            times = self._import_thumb_times
+            slowest, slowest_path = max(times)
+            average = sum(t for t, _ in times) / len(times)
+            self.statusBar().showMessage(
+                f"Превью (файлов: {len(times)}): в среднем {average * 1000:.0f} мс, "
+                f"дольше всего {slowest * 1000:.0f} мс – {os.path.basename(slowest_path)}", 10000)
+            self._import_thumb_times = []
+        if not self._scan_running:
+            self.import_progress.setVisible(False)
+        self._schedule_visible_thumbnails()
+
+    def _flush_pending_videos(self):
+        """Записывает накопленные при импорте видео: новые и обновлённые – по одной транзакции."""
+        videos, self._pending_db_videos = self._pending_db_videos, []
+        self.save_videos_to_database(videos)
+        updated, self._pending_db_updates = self._pending_db_updates, []
+        if updated:
+            self.db.update_many([video.to_row() for video in updated])
+        stale, self._stale_proxies = self._stale_proxies, []
+        if stale:
+            self.db.delete_proxies([video_id for video_id, _ in stale])
+            self._remove_files_in_background([proxy_path for _, proxy_path in stale])
+
+    def save_video_to_database(self, video):
+        self.save_videos_to_database([video])
+
+    def save_videos_to_database(self, videos: list['Video']):
+        if videos:
+            ids = self.db.insert_many([video.to_row() for video in videos])
+            for video, video_id in zip(videos, ids):
+                video.id = video_id
+            self.video_model.register_ids(videos)
 
     def delete_selected_videos(self):
-        selected_items = self.list_widget.selectedItems()
-        if not selected_items:
-            return
-        videos = [item.data(Qt.ItemDataRole.UserRole) for item in selected_items if item.data(Qt.ItemDataRole.UserRole)]
+        videos = self._selected_videos()
         if not videos:
             return
 
@@ -309,46 +871,200 @@ class VideoLibraryApp(QMainWindow):
         box.exec()
 
         if box.clickedButton() == yes_btn:
-            for video in videos:
-                if video in self.video_library:
-                    self.video_library.remove(video)
-                self.delete_video_from_database(video)
-            self._refresh_table(self.video_library)
+            self.video_model.remove_videos(videos)
+            self.search_model.remove_videos(videos)
+            self.delete_videos_from_database(videos)
 
     def convert_selected_video(self):
-        selected_items = self.list_widget.selectedItems()
-        if len(selected_items) == 1:
-            video: Video | None = selected_items[0].data(Qt.ItemDataRole.UserRole)
-            if video:
-                self.convert_video(video)
+        videos = self._selected_videos()
+        if len(videos) == 1:
+            self.convert_video(videos[0])
+        elif videos:
+            self.enqueue_conversion(videos)
         else:
-            QMessageBox.information(self, "Конвертировать", "Выберите одно видео для конвертации.")
+            QMessageBox.information(self, "Конвертировать", "Выберите видео для конвертации.")
+
+    def enqueue_conversion(self, videos: list['Video']):
+        """Ставит выбранные видео в очередь конвертации в один формат."""
+        fmt_label, ok = QInputDialog.getItem(
+            self, "Конвертировать", f"Формат для {len(videos)} видео:", [f.upper() for f in FORMATS], 0, False
+        )
+        if not ok:
+            return
+        fmt = fmt_label.lower()
+        # Выходные пути не должны совпадать ни с существующими файлами, ни между собой
+        taken = {job.output_path for job in self.conversion_queue.jobs.values() if not job.is_finished}
+        for video in videos:
+            base = os.path.splitext(video.file_path)[0]
+            target_path = f"{base}_conv.{fmt}"
+            n = 1
+            while os.path.exists(target_path) or target_path in taken:
+                n += 1
+                target_path = f"{base}_conv{n}.{fmt}"
+            taken.add(target_path)
+            self.conversion_queue.enqueue(video.file_path, target_path, fmt)
+        self.show_conversion_queue()
+
+    def show_conversion_queue(self):
+        """Немодальное окно очереди конвертации."""
+        if self._queue_dialog is None:
+            self._queue_dialog = ConversionQueueDialog(self.conversion_queue, self)
+        self._queue_dialog.show()
+        self._queue_dialog.raise_()
+        self._queue_dialog.activateWindow()
+
+    def generate_proxies(self, videos: list['Video']):
+        """Ставит в очередь создание прокси для выбранных видео."""
+        self._flush_pending_videos()  # прокси связывается с видео по id
+        for video in videos:
+            if video.id is None:
+                continue
+            name = hashlib.sha1(os.path.abspath(video.file_path).encode("utf-8")).hexdigest()[:16]
+            target_path = os.path.join(PROXY_DIR, f"{name}_{PROXY_HEIGHT}p.mp4")
+            os.makedirs(PROXY_DIR, exist_ok=True)
+            self.conversion_queue.enqueue_proxy(video.id, video.file_path, target_path, PROXY_HEIGHT, PROXY_MAX_FPS)
+        self.show_conversion_queue()
+
+    def _on_proxy_ready(self, video_id: int, proxy_path: str):
+        for video in self.video_model.videos_by_ids([video_id]):
+            video.proxy_path = proxy_path
+
+    def _on_conversion_job_finished(self, job_id: int, success: bool):
+        job = self.conversion_queue.jobs[job_id]
+        if success:
+            self.statusBar().showMessage(f"Сконвертировано: {os.path.basename(job.output_path)}", 5000)
 
     # ---- Event filter для очистки выделения ----
     def eventFilter(self, obj, event):
-        if obj is self.list_widget.viewport() and event.type() == QEvent.Type.MouseButtonPress:
-            index = self.list_widget.indexAt(event.pos())
+        if obj is self.list_view.viewport() and event.type() == QEvent.Type.MouseButtonPress:
+            index = self.list_view.indexAt(event.pos())
             if not index.isValid():
-                self.list_widget.clearSelection()
+                self.list_view.clearSelection()
+        elif obj is self.list_view.viewport() and event.type() == QEvent.Type.Resize:
+            self._schedule_visible_thumbnails()
+        elif obj is self.list_view.viewport() and event.type() == QEvent.Type.MouseMove:
+            self._update_hover_sprite(event.position().toPoint())
+            if PREWARM_PLAYER:
+                self._schedule_prewarm(self.list_view.indexAt(event.position().toPoint()))
+        elif obj is self.list_view.viewport() and event.type() == QEvent.Type.Leave:
+            self._update_hover_sprite(QPoint(-1, -1))
         return super().eventFilter(obj, event)
 
+    def closeEvent(self, event):
+        if self._scan_worker is not None:
+            # Результаты уже не нужны: отключаемся, чтобы не запустить импорт после закрытия
+            self._scan_worker.batchFound.disconnect(self._on_scan_batch)
+            self._scan_worker.cancel()
+        if self._scan_thread is not None:
+            # quit() до wait(): сигнал finished от воркера дошёл бы до нас только через цикл событий
+            self._scan_thread.quit()
+            self._scan_thread.wait()
+        self.player_pool.shutdown()
+        self.probe_pool.shutdown()
+        self.conversion_queue.shutdown()
+        self._flush_pending_videos()
+        self.thumb_loader.shutdown()
+        self.sprite_loader.shutdown()
+        self._keyframe_pool.clear()
+        self._keyframe_pool.waitForDone()
+        self._search_worker.supersede(-1)
+        self._search_thread.quit()
+        self._search_thread.wait()
+        self._search_worker.close()
+        self._io_pool.waitForDone()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+        if self._watchdog is not None:
+            self._write_stall_report(self._watchdog.stop())
+            self._watchdog = None
+        super().closeEvent(event)
+
+    @staticmethod
+    def _write_stall_report(report: str):
+        """Сводка сторожа зависаний – в лог и в STALL_REPORT_PATH (её прикладывают к отчёту об ошибке)."""
+        logging.getLogger("stallwatch").info("%s", report)
+        try:
+            with open(STALL_REPORT_PATH, "w", encoding="utf-8") as f:
+                f.write(f"{datetime.datetime.now():%Y-%m-%d %H:%M:%S}\n{report}\n")
+        except OSError:
+            pass
+
     def delete_video_from_database(self, video):
-        connection = sqlite3.connect("video_library.db")
-        cursor = connection.cursor()
+        self.delete_videos_from_database([video])
+
+    def delete_videos_from_database(self, videos: list['Video']):
+        """Удаляет записи одной транзакцией в фоне; GUI-поток не ждёт диска."""
+        ids = [video.id for video in videos if video.id is not None]
+        # Недостроенный прокси удалённого видео больше не нужен
+        self.conversion_queue.cancel_proxy_jobs(ids)
+        # Ещё не записанные при импорте видео просто не попадут в базу
+        unsaved = {id(video) for video in videos if video.id is None}
+        if unsaved:
+            self._pending_db_videos = [v for v in self._pending_db_videos if id(v) not in unsaved]
+        removed = {id(video) for video in videos}
+        self._pending_db_updates = [v for v in self._pending_db_updates if id(v) not in removed]
+        file_paths = [video.file_path for video in videos]
+        proxy_paths = [video.proxy_path for video in videos if video.proxy_path]
+        for video in videos:
+            self.thumbnails.discard(video.thumbnail_key)
+            self.sprites.discard(video.file_path)
+        self._forget_keyframe_index(file_paths + proxy_paths)
 
-        cursor.execute("DELETE FROM videos WHERE file_path = ?", (video.file_path,))
+        def work():
+            self.db.delete_many_ids(ids)
+            self.db.delete_keyframe_index(file_paths + proxy_paths)
+            for file_path in file_paths:
+                self.thumb_cache.invalidate(file_path)
 
-        connection.commit()
-        connection.close()
+        self._io_pool.start(work)
+        # Связи с прокси удаляет триггер, сами файлы – здесь (пул однопоточный, порядок сохраняется)
+        if proxy_paths:
+            self._remove_files_in_background(proxy_paths)
+
+    def _remove_files_in_background(self, file_paths: list[str]):
+        def work():
+            for file_path in file_paths:
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
 
+        self._io_pool.start(work)
+
+    def _schedule_search(self):
+        self._search_timer.start()
+
+    @tracing.traced(cat="ui")
     def filter_videos(self):
-        search_text = self.search_line_edit.text().lower()
-        filtered_videos = [v for v in self.video_library if search_text in v.title.lower()]
-        self._refresh_table(filtered_videos)
+        """Запускает полнотекстовый поиск; предыдущий незавершённый запрос отменяется."""
+        text = self.search_line_edit.text()
+        self._search_generation += 1
+        self._search_worker.supersede(self._search_generation)
+        if database.fts_query(text) is None:
+            # Пустой запрос – показываем всю библиотеку
+            self.list_view.setModel(self.video_model)
+            self.search_model.set_videos([])
+            return
+        # Ещё не записанные при импорте видео должны попасть в индекс до поиска
+        self._flush_pending_videos()
+        self.searchRequested.emit(self._search_generation, text)
+
+    @tracing.traced(cat="ui")
+    def _on_search_results(self, generation: int, ids: list, final: bool):
+        if generation != self._search_generation:
+            return  # ответ на устаревший запрос
+        first_page = self.list_view.model() is not self.search_model or self._search_page_generation != generation
+        if first_page:
+            self._search_page_generation = generation
+            self.search_model.set_videos(self.video_model.videos_by_ids(ids))
+            self.list_view.setModel(self.search_model)
+        else:
+            self.search_model.append_videos(self.video_model.videos_by_ids(ids))
 
     # Переименовали дублирующий метод, чтобы не перекрывать основной open_selected_video
     def open_video_with_os(self, index):
-        video = self.video_library[index.row()]
+        video = index.data(Qt.ItemDataRole.UserRole)
         QDesktopServices.openUrl(QUrl.fromLocalFile(video.file_path))
 
     def apply_styles(self):
@@ -383,21 +1099,21 @@ class VideoLibraryApp(QMainWindow):
             }
 
             /* Таблица как список */
-            QListWidget {
+            QListView {
                 background: #1a1a1a;
                 outline: none;
             }
 
-            QListWidget::item {
+            QListView::item {
                 border-radius: 6px;
             }
 
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background: #333333;
                 border-radius: 6px;
             }
 
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background: #505050;
                 border-radius: 6px;
             }
@@ -417,40 +1133,38 @@ class VideoLibraryApp(QMainWindow):
             }
         """)
 
-    # ---------- Метаданные видео ----------
-    @staticmethod
-    def get_video_info(file_path: str) -> tuple[str | None, str | None]:
-        """Возвращает (длительность «MM:SS», разрешение «ШxВ») или (None, None) при ошибке.
-        Использует OpenCV, без зависимости от ffmpeg/ffprobe."""
-        try:
-            import cv2  # pylint: disable=import-error
-
-            cap = cv2.VideoCapture(file_path)
-            if not cap.isOpened():
-                return None, None
-
-            fps = cap.get(cv2.CAP_PROP_FPS) or 0
-            frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
-            duration_sec = frame_count / fps if fps else None
-
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            cap.release()
-
-            duration_str = None
-            if duration_sec is not None:
-                m, s = divmod(int(duration_sec + 0.5), 60)
-                h, m = divmod(m, 60)
-                duration_str = f"{h:02d}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
-
-            resolution_str = f"{width}x{height}" if width and height else None
-            return duration_str, resolution_str
-        except Exception:
-            return None, None
+    # ---------- Превью видео ----------
+    @tracing.traced(cat="io")
+    def load_thumbnail_image(self, file_path: str) -> QImage | None:
+        """Берёт превью из дискового кэша, при промахе извлекает кадр и кэширует его.
+        Вызывается из потоков ThumbnailLoader, поэтому работает только с QImage."""
+        image = self.thumb_cache.get_image(file_path)
+        if image is not None:
+            return image
+        image = self.get_video_thumbnail_image(file_path)
+        if image is not None:
+            self.thumb_cache.put(file_path, image)
+        return image
+
+    @tracing.traced(cat="io")
+    def load_sprite_image(self, file_path: str) -> QImage | None:
+        """Лист кадров из дискового кэша превью или, при промахе, из файла (см. ``probe.make_sprite_sheet``).
+        Вызывается из потока sprite_loader."""
+        image = self.thumb_cache.get_image(file_path, ThumbnailCache.SPRITE)
+        if image is not None:
+            return image
+        data = probe.make_sprite_sheet(file_path)
+        if data is None:
+            return None
+        self.thumb_cache.put_encoded(file_path, data, ThumbnailCache.SPRITE)
+        return QImage.fromData(data)
 
     @staticmethod
-    def get_video_thumbnail(file_path: str, seek_sec: float = 1.0) -> QPixmap | None:
-        """Возвращает QPixmap с кадром-превью (через OpenCV) или None при ошибке."""
+    @tracing.traced("get_video_thumbnail_image", cat="io")
+    def get_video_thumbnail_image(file_path: str, seek_sec: float | None = None) -> QImage | None:
+        """Возвращает QImage с кадром-превью (через OpenCV) или None при ошибке.
+        Без ``seek_sec`` выбирается лучший из нескольких кадров (``probe.select_thumbnail_frame``).
+        В отличие от QPixmap, QImage можно создавать вне GUI-потока."""
         try:
             import cv2  # pylint: disable=import-error
 
@@ -458,11 +1172,14 @@ class VideoLibraryApp(QMainWindow):
             if not cap.isOpened():
                 return None
 
-            # Переходим к нужному времени, если возможно
-            cap.set(cv2.CAP_PROP_POS_MSEC, seek_sec * 1000)
-            ret, frame = cap.read()
-            cap.release()
-            if not ret or frame is None:
+            try:
+                if seek_sec is None:
+                    frame = probe.select_thumbnail_frame(cap)
+                else:
+                    frame = probe.read_thumbnail_frame(cap, seek_sec)
+            finally:
+                cap.release()
+            if frame is None:
                 return None
 
             # OpenCV возвращает BGR; преобразуем в RGB
@@ -470,23 +1187,23 @@ class VideoLibraryApp(QMainWindow):
             h, w, ch = frame_rgb.shape
             bytes_per_line = ch * w
             image = QImage(frame_rgb.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-            pixmap = QPixmap.fromImage(image)
-            return pixmap
+            # copy() отвязывает изображение от буфера numpy
+            return image.copy()
         except Exception:
             return None
 
     def show_context_menu(self, pos):
-        item = self.list_widget.itemAt(pos)
-        if item is None:
+        index = self.list_view.indexAt(pos)
+        if not index.isValid():
             return
-        video: Video | None = item.data(Qt.ItemDataRole.UserRole)
+        video: Video | None = index.data(Qt.ItemDataRole.UserRole)
         if video is None:
             return
 
         menu = QMenu(self)
-        selected_items = self.list_widget.selectedItems()
+        selected_videos = self._selected_videos()
 
-        single_selection = len(selected_items) == 1
+        single_selection = len(selected_videos) == 1
 
         if single_selection:
             action_convert = QAction("Конвертировать", self)
@@ -495,14 +1212,22 @@ class VideoLibraryApp(QMainWindow):
             menu.addAction(action_properties)
             action_properties.triggered.connect(lambda _: self.show_properties(video))
             action_convert.triggered.connect(lambda _: self.convert_video(video))
+        elif selected_videos:
+            action_enqueue = QAction(f"Конвертировать ({len(selected_videos)})", self)
+            menu.addAction(action_enqueue)
+            action_enqueue.triggered.connect(lambda _: self.enqueue_conversion(selected_videos))
+
+        action_proxy = QAction("Создать прокси", self)
+        menu.addAction(action_proxy)
+        action_proxy.triggered.connect(lambda _: self.generate_proxies(selected_videos))
 
         action_delete = QAction("Удалить", self)
-        if single_selection and menu.actions():
+        if menu.actions():
             menu.addSeparator()
         menu.addAction(action_delete)
         action_delete.triggered.connect(lambda _: self.delete_selected_videos())
 
-        global_pos = self.list_widget.mapToGlobal(pos)
+        global_pos = self.list_view.mapToGlobal(pos)
         menu.exec(global_pos)
 
     def delete_video_with_confirmation(self, video: 'Video'):
@@ -516,10 +1241,9 @@ class VideoLibraryApp(QMainWindow):
         box.exec()
 
         if box.clickedButton() == yes_btn:
-            if video in self.video_library:
-                self.video_library.remove(video)
+            self.video_model.remove_videos([video])
+            self.search_model.remove_videos([video])
             self.delete_video_from_database(video)
-            self._refresh_table(self.video_library)
 
     def convert_video(self, video: 'Video'):
         """Открывает диалог конвертации выбранного видео."""
@@ -554,8 +1278,18 @@ class VideoLibraryApp(QMainWindow):
 
 
 class VideoItemDelegate(QStyledItemDelegate):
-    """Рисуем в элементе: превью, жирный заголовок и обычную длительность."""
+    """Рисуем в элементе: превью, жирный заголовок и обычную длительность.
+
+    Под курсором вместо превью показывается кадр листа перемотки,
+    соответствующий положению мыши по ширине карточки (``hover_sprite``).
+    """
+
+    def __init__(self, sprites: ThumbnailMemoryCache, parent=None):
+        super().__init__(parent)
+        self._sprites = sprites
+        self.hover_sprite: tuple[str, float] | None = None  # путь, позиция 0..1
 
+    @tracing.traced("VideoItemDelegate.paint", cat="ui")
     def paint(self, painter: QPainter, option, index):
         video = index.data(Qt.ItemDataRole.UserRole)
         icon: QIcon | None = index.data(Qt.ItemDataRole.DecorationRole)
@@ -573,9 +1307,14 @@ class VideoItemDelegate(QStyledItemDelegate):
         elif option.state & QStyle.StateFlag.State_MouseOver:
             painter.fillPath(path, QColor("#333333"))
 
-        # Превью (иконка)
-        if icon is not None:
-            icon_rect = QRect(rect.x() + (rect.width() - 160) // 2, rect.y(), 160, 90)
+        # Превью (иконка) или кадр листа под курсором
+        icon_rect = QRect(rect.x() + (rect.width() - 160) // 2, rect.y(), 160, 90)
+        sheet = None
+        if self.hover_sprite is not None and self.hover_sprite[0] == video.file_path:
+            sheet = self._sprites.get(video.file_path)
+        if sheet is not None:
+            painter.drawPixmap(icon_rect, sprite_tile(sheet, self.hover_sprite[1]))
+        elif icon is not None:
             icon.paint(painter, icon_rect, Qt.AlignmentFlag.AlignCenter)
 
         text_y = rect.y() + 95
@@ -605,80 +1344,10 @@ class VideoItemDelegate(QStyledItemDelegate):
 # ---------- Конвертация видео ----------
 
 
-class CVConvertWorker(QObject):
-    """Конвертирует видео средствами OpenCV: читаем кадры и записываем заново с нужным кодеком."""
-
-    progressChanged = pyqtSignal(int, float)  # проценты, ETA (сек)
-    finished = pyqtSignal(bool, str)  # успех, путь выходного файла
-
-    _FORMAT_FOURCC = {
-        "mp4": "mp4v",
-        "avi": "XVID",
-        "mkv": "X264",  # может не работать – зависит от сборки OpenCV
-        "mov": "mp4v",
-        "webm": "VP90",  # поддержка ограничена
-        "mpg": "PIM1",
-    }
-
-    def __init__(self, input_path: str, output_path: str):
-        super().__init__()
-        self._in = input_path
-        self._out = output_path
-
-    def run(self):  # noqa: C901 – сложная, но линейная логика
-        import cv2  # pylint: disable=import-error
-        import time, os
-
-        cap = cv2.VideoCapture(self._in)
-        if not cap.isOpened():
-            self.finished.emit(False, self._out)
-            return
-
-        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-
-        # Определяем fourcc
-        ext = os.path.splitext(self._out)[1].lstrip('.').lower()
-        fourcc_str = self._FORMAT_FOURCC.get(ext, "XVID")
-        writer = cv2.VideoWriter(self._out, cv2.VideoWriter_fourcc(*fourcc_str), fps, (width, height))
-
-        if not writer.isOpened():
-            # Попытка fallback
-            writer = cv2.VideoWriter(self._out, cv2.VideoWriter_fourcc(*"XVID"), fps, (width, height))
-            if not writer.isOpened():
-                cap.release()
-                self.finished.emit(False, self._out)
-                return
-
-        processed = 0
-        start_ts = time.time()
-        update_each = max(int(fps // 2), 1)  # обновлять ~2 раза в секунду
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            writer.write(frame)
-            processed += 1
-
-            if total_frames and processed % update_each == 0:
-                percent = int(processed / total_frames * 100)
-                eta = ((total_frames - processed) / fps) if fps else 0.0
-                self.progressChanged.emit(percent, eta)
-
-        cap.release()
-        writer.release()
-
-        self.progressChanged.emit(100, 0.0)
-        self.finished.emit(True, self._out)
-
-
 class ConvertDialog(QDialog):
     """Диалог выбора формата и отображения прогресса конвертации."""
 
-    _FORMATS = ["mp4", "avi", "mkv", "mov", "webm", "mpg"]
+    _FORMATS = FORMATS
 
     def __init__(self, video: 'Video', parent=None):
         super().__init__(parent)
@@ -699,6 +1368,39 @@ class ConvertDialog(QDialog):
             self.combo.setCurrentIndex((self._FORMATS.index(cur_fmt) + 1) % len(self._FORMATS))
         layout.addWidget(self.combo)
 
+        # Второй файл из того же прохода декодирования, например MP4 для сети и AVI для архива
+        layout.addWidget(QLabel("Также сохранить как:"))
+        extra_row = QHBoxLayout()
+        self.combo_extra = QComboBox()
+        self.combo_extra.addItem("—", None)
+        for fmt in self._FORMATS:
+            self.combo_extra.addItem(fmt.upper(), fmt)
+        self.combo_extra_height = QComboBox()
+        for label, height in (("Исходное разрешение", None), ("1080p", 1080), ("720p", 720), ("480p", 480)):
+            self.combo_extra_height.addItem(label, height)
+        extra_row.addWidget(self.combo_extra)
+        extra_row.addWidget(self.combo_extra_height)
+        layout.addLayout(extra_row)
+
+        # Фрагмент: декодируется только выбранный диапазон
+        self.check_clip = QCheckBox("Только фрагмент")
+        layout.addWidget(self.check_clip)
+        clip_row = QHBoxLayout()
+        self.edit_start = QTimeEdit()
+        self.edit_end = QTimeEdit()
+        total_sec = video.duration_sec or self._duration_to_sec(video.duration) or 0
+        for edit in (self.edit_start, self.edit_end):
+            edit.setDisplayFormat("HH:mm:ss.zzz")
+            edit.setMaximumTime(QTime(0, 0).addMSecs(int(total_sec * 1000)) if total_sec else QTime(23, 59, 59))
+            edit.setEnabled(False)
+            self.check_clip.toggled.connect(edit.setEnabled)
+        self.edit_end.setTime(self.edit_end.maximumTime())
+        clip_row.addWidget(QLabel("с"))
+        clip_row.addWidget(self.edit_start)
+        clip_row.addWidget(QLabel("по"))
+        clip_row.addWidget(self.edit_end)
+        layout.addLayout(clip_row)
+
         self.progress = QProgressBar()
         self.progress.setRange(0, 100)
         self.progress.setVisible(False)
@@ -708,37 +1410,47 @@ class ConvertDialog(QDialog):
         self.label_eta.setVisible(False)
         layout.addWidget(self.label_eta)
 
+        # Скорость стадий конвейера: самая медленная и есть узкое место
+        self.label_stages = QLabel()
+        self.label_stages.setVisible(False)
+        layout.addWidget(self.label_stages)
+
         self.btn_convert = QPushButton("Конвертировать")
         self.btn_convert.clicked.connect(self._on_convert_clicked)
         layout.addWidget(self.btn_convert)
 
+        self.btn_cancel = QPushButton("Отмена")
+        self.btn_cancel.clicked.connect(self.reject)
+        self.btn_cancel.setVisible(False)
+        layout.addWidget(self.btn_cancel)
+
         self._thread: QThread | None = None
-        self._worker: CVConvertWorker | None = None
+        self._worker: CVConvertWorker | FFmpegConvertWorker | None = None
+        self._running = False
+        self._extra_paths: list[str] = []
 
     # ---------- Внутреннее ----------
 
     @staticmethod
     def _duration_to_sec(duration: str | None) -> float | None:
         """Конвертирует строку вида HH:MM:SS или MM:SS в секунды."""
-        if not duration:
-            return None
-        parts = duration.split(':')
-        try:
-            if len(parts) == 3:
-                h, m, s = parts
-            elif len(parts) == 2:
-                h = 0
-                m, s = parts
-            else:
-                return None
-            return int(h) * 3600 + int(m) * 60 + int(float(s))
-        except ValueError:
-            return None
+        return database.parse_duration(duration)
+
+    def _clip_range(self) -> tuple[float | None, float | None]:
+        if not self.check_clip.isChecked():
+            return None, None
+        start = QTime(0, 0).msecsTo(self.edit_start.time()) / 1000
+        end = QTime(0, 0).msecsTo(self.edit_end.time()) / 1000
+        return start, end
 
     def _on_convert_clicked(self):
         fmt = self.combo.currentData()
+        start_sec, end_sec = self._clip_range()
+        if end_sec is not None and end_sec <= start_sec:
+            QMessageBox.warning(self, "Фрагмент", "Конец фрагмента должен быть позже начала.")
+            return
         base = os.path.splitext(self._video.file_path)[0]
-        default_target = f"{base}_conv.{fmt}"
+        default_target = f"{base}_{'clip' if end_sec is not None else 'conv'}.{fmt}"
 
         target_path, _ = QFileDialog.getSaveFileName(
             self,
@@ -756,35 +1468,211 @@ class ConvertDialog(QDialog):
         self.label_eta.setVisible(True)
         self.btn_convert.setEnabled(False)
         self.combo.setEnabled(False)
-
-        total_sec = self._duration_to_sec(self._video.duration)
-
-        self._worker = CVConvertWorker(self._video.file_path, target_path)
+        self.combo_extra.setEnabled(False)
+        self.combo_extra_height.setEnabled(False)
+        self.check_clip.setEnabled(False)
+        self.edit_start.setEnabled(False)
+        self.edit_end.setEnabled(False)
+        self.btn_cancel.setVisible(True)
+
+        total_sec = self._video.duration_sec
+        if total_sec is None:
+            total_sec = self._duration_to_sec(self._video.duration)
+
+        extra_outputs = []
+        extra_fmt = self.combo_extra.currentData()
+        if extra_fmt:
+            extra_height = self.combo_extra_height.currentData()
+            suffix = f"_{extra_height}p" if extra_height else ""
+            extra_path = f"{os.path.splitext(target_path)[0]}{suffix}.{extra_fmt}"
+            if extra_path == target_path:
+                extra_path = f"{os.path.splitext(target_path)[0]}_2.{extra_fmt}"
+            extra_outputs.append(OutputTarget(extra_path, max_height=extra_height))
+        self._extra_paths = [target.path for target in extra_outputs]
+
+        self._running = True
+        self._worker = create_convert_worker(self._video.file_path, target_path, duration_sec=total_sec,
+                                             extra_outputs=extra_outputs, start_sec=start_sec, end_sec=end_sec)
         self._thread = QThread()
+        self._thread.setObjectName("convert-dialog")
         self._worker.moveToThread(self._thread)
         self._thread.started.connect(self._worker.run)
         self._worker.progressChanged.connect(self._on_progress)
+        self._worker.stageThroughputChanged.connect(self._on_stage_throughput)
         self._worker.finished.connect(self._on_finished)
         self._worker.finished.connect(self._thread.quit)
         self._worker.finished.connect(self._worker.deleteLater)
         self._thread.finished.connect(self._thread.deleteLater)
         self._thread.start()
 
-    def _on_progress(self, percent: int, eta: float):
-        self.progress.setValue(percent)
+    def _on_progress(self, percent: int, eta: float, speed: float):
+        if percent < 0:
+            # Длительность неизвестна – бегущий индикатор вместо процентов
+            self.progress.setRange(0, 0)
+        else:
+            self.progress.setRange(0, 100)
+            self.progress.setValue(percent)
+        parts = []
         if eta:
-            mins, secs = divmod(int(eta), 60)
-            self.label_eta.setText(f"Оставшееся время: {mins:02d}:{secs:02d}")
+            parts.append(f"Оставшееся время: {format_eta(eta)}")
+        if speed:
+            parts.append(f"скорость {speed:.1f}x")
+        if parts:
+            self.label_eta.setText(" · ".join(parts))
+
+    def _on_stage_throughput(self, stages: dict):
+        self.label_stages.setText(format_stage_throughput(stages))
+        self.label_stages.setVisible(True)
+
+    def reject(self):
+        """Закрытие во время конвертации отменяет её; частичный файл удаляет воркер."""
+        if self._running and self._worker is not None:
+            self._running = False
+            self._worker.cancel()
+            self._thread.quit()
+            self._thread.wait()
+        super().reject()
 
     def _on_finished(self, success: bool, output_path: str):
+        if not self._running:
+            return  # отменено пользователем
+        self._running = False
         if success:
-            QMessageBox.information(self, "Конвертация завершена", f"Файл сохранён:\n{output_path}")
+            paths = "\n".join([output_path] + self._extra_paths)
+            QMessageBox.information(self, "Конвертация завершена", f"Сохранено:\n{paths}")
         else:
-            QMessageBox.warning(self, "Ошибка", "Конвертация не удалась. Проверьте наличие ffmpeg.")
+            details = getattr(self._worker, "error_output", "")
+            text = "Конвертация не удалась."
+            if details:
+                text += f"\n{details.strip()}"
+            elif not ffmpeg_path():
+                text += " Проверьте наличие ffmpeg."
+            QMessageBox.warning(self, "Ошибка", text)
         self.accept()
 
 
+class ConversionQueueDialog(QDialog):
+    """Немодальное окно очереди: прогресс каждого задания и общий, пауза и отмена."""
+
+    _STATUS_TEXT = {
+        ConversionJob.QUEUED: "В очереди",
+        ConversionJob.RUNNING: "Выполняется",
+        ConversionJob.PAUSED: "Пауза",
+        ConversionJob.DONE: "Готово",
+        ConversionJob.FAILED: "Ошибка",
+        ConversionJob.CANCELLED: "Отменено",
+    }
+
+    def __init__(self, queue: ConversionQueue, parent=None):
+        super().__init__(parent)
+        self._queue = queue
+        self._rows: dict[int, int] = {}  # id задания -> строка таблицы
+        self.setWindowTitle("Очередь конвертации")
+        self.setModal(False)
+        self.resize(640, 360)
+
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["Файл", "Формат", "Статус", "Прогресс"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.total_progress = QProgressBar()
+        self.total_progress.setRange(0, 100)
+        self.total_progress.setFormat("Всего: %p%")
+        layout.addWidget(self.total_progress)
+
+        buttons = QHBoxLayout()
+        self.btn_pause = QPushButton("Пауза")
+        self.btn_pause.clicked.connect(self._on_pause_clicked)
+        self.btn_resume = QPushButton("Продолжить")
+        self.btn_resume.clicked.connect(self._on_resume_clicked)
+        self.btn_cancel = QPushButton("Отменить")
+        self.btn_cancel.clicked.connect(self._on_cancel_clicked)
+        self.btn_pause_all = QPushButton("Приостановить очередь")
+        self.btn_pause_all.setCheckable(True)
+        self.btn_pause_all.setChecked(queue.paused)
+        self.btn_pause_all.toggled.connect(queue.set_paused)
+        for btn in (self.btn_pause, self.btn_resume, self.btn_cancel):
+            buttons.addWidget(btn)
+        self.table.itemSelectionChanged.connect(self._update_buttons)
+        buttons.addStretch()
+        buttons.addWidget(self.btn_pause_all)
+        layout.addLayout(buttons)
+
+        for job_id in queue.jobs:
+            self._add_row(job_id)
+        queue.jobAdded.connect(self._add_row)
+        queue.jobChanged.connect(self._update_row)
+        queue.jobChanged.connect(self._update_buttons)
+        queue.aggregateProgressChanged.connect(self.total_progress.setValue)
+        self.total_progress.setValue(queue.aggregate_progress())
+        self._update_buttons()
+
+    def _selected_job_ids(self) -> list[int]:
+        rows = {index.row() for index in self.table.selectionModel().selectedRows()}
+        return [job_id for job_id, row in self._rows.items() if row in rows]
+
+    def _add_row(self, job_id: int):
+        job = self._queue.jobs[job_id]
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self._rows[job_id] = row
+        name_item = QTableWidgetItem(os.path.basename(job.input_path))
+        name_item.setToolTip(f"{job.input_path}\n→ {job.output_path}")
+        self.table.setItem(row, 0, name_item)
+        fmt_text = job.format.upper()
+        if job.kind == ConversionJob.PROXY:
+            fmt_text = f"Прокси {job.params.get('height')}p"
+        self.table.setItem(row, 1, QTableWidgetItem(fmt_text))
+        self.table.setItem(row, 2, QTableWidgetItem())
+        bar = QProgressBar()
+        bar.setRange(0, 100)
+        self.table.setCellWidget(row, 3, bar)
+        self._update_row(job_id)
+
+    def _update_row(self, job_id: int):
+        row = self._rows.get(job_id)
+        if row is None:
+            return
+        job = self._queue.jobs[job_id]
+        status = self._STATUS_TEXT.get(job.status, job.status)
+        if job.resume_pending:
+            status += " · ждёт слота"
+        if job.status == ConversionJob.RUNNING and job.speed:
+            status += f" · {job.speed:.1f}x"
+            if job.eta:
+                status += f" · {format_eta(job.eta)}"
+        self.table.item(row, 2).setText(status)
+        self.table.item(row, 2).setToolTip(format_stage_throughput(job.stage_fps))
+        self.table.cellWidget(row, 3).setValue(job.progress)
+
+    def _update_buttons(self):
+        selected = self._selected_job_ids()
+        # ffmpeg на Windows не приостанавливается: такое задание продолжило бы работу вне лимита очереди
+        pausable = [job_id for job_id in selected if self._queue.can_pause_job(job_id)]
+        self.btn_pause.setEnabled(not selected or bool(pausable))
+        self.btn_pause.setToolTip("" if not selected or pausable else "Это задание нельзя приостановить на этой системе")
+
+    def _on_pause_clicked(self):
+        for job_id in self._selected_job_ids():
+            self._queue.pause_job(job_id)
+
+    def _on_resume_clicked(self):
+        for job_id in self._selected_job_ids():
+            self._queue.resume_job(job_id)
+
+    def _on_cancel_clicked(self):
+        for job_id in self._selected_job_ids():
+            self._queue.cancel_job(job_id)
+
+
 if __name__ == "__main__":
+    if PLAYER_DEBUG or STALL_WATCHDOG:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
     window = VideoLibraryApp()
     window.resize(900, 600)
@@ -0,0 +1,316 @@
+"""Извлечение метаданных и превью из видеофайлов.
+
+Модуль намеренно не импортирует Qt: функции вызываются в дочерних
+процессах пула импорта и должны возвращать только picklable-данные.
+"""
+import os
+import time
+
+import containers
+import tracing
+
+THUMB_SIZE = (320, 180)
+JPEG_QUALITY = 80
+
+# Лист превью для перемотки: SPRITE_COUNT кадров сеткой по SPRITE_COLUMNS в строке
+# (у коротких роликов кадров меньше – см. sprite_layout)
+SPRITE_COUNT = 50
+SPRITE_COLUMNS = 10
+SPRITE_TILE = (160, 90)
+# Промежуток (в кадрах), начиная с которого дешевле перемотать, чем пропускать кадры через grab()
+GRAB_SEEK_GAP = 250
+
+# Выбор кадра превью: первый кандидат – на THUMB_FIRST_SEC (как раньше), остальные – доли длительности.
+# Кандидаты оцениваются на уменьшенной копии; достаточно хороший кадр прекращает поиск.
+THUMB_FIRST_SEC = 1.0
+THUMB_CANDIDATES = (0.1, 0.25, 0.5, 0.75)
+THUMB_SCORE_SIZE = (64, 36)
+THUMB_GOOD_SCORE = 30.0
+
+
+def _fourcc_to_str(fourcc: int) -> str | None:
+    return "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ") or None
+
+
+def read_metadata(cap) -> dict:
+    """Числовые метаданные из открытого cv2.VideoCapture."""
+    import cv2  # pylint: disable=import-error
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    return {
+        "duration_sec": frame_count / fps if fps else None,
+        "width": width or None,
+        "height": height or None,
+        "fps": fps or None,
+        "frame_count": frame_count or None,
+        "codec": _fourcc_to_str(int(cap.get(cv2.CAP_PROP_FOURCC))),
+    }
+
+
+def merge_metadata(header: dict | None, metadata: dict) -> dict:
+    """Дополняет метаданные OpenCV найденным в заголовках контейнера – заголовкам доверяем больше.
+
+    Для TS из заголовков известна только длительность; число кадров тогда
+    пересчитывается по ней, т.к. CAP_PROP_FRAME_COUNT для таких потоков неверен.
+    """
+    if not header:
+        return metadata
+    metadata = dict(metadata, **header)
+    if "frame_count" not in header and metadata.get("duration_sec") and metadata.get("fps"):
+        metadata["frame_count"] = round(metadata["duration_sec"] * metadata["fps"])
+    return metadata
+
+
+def _fit_size(frame, max_size: tuple[int, int] | None):
+    """Уменьшает кадр, чтобы он поместился в ``max_size`` (не увеличивает)."""
+    import cv2  # pylint: disable=import-error
+
+    if max_size is None:
+        return frame
+    h, w = frame.shape[:2]
+    scale = min(max_size[0] / w, max_size[1] / h)
+    if scale < 1.0:
+        frame = cv2.resize(frame, (max(int(w * scale), 1), max(int(h * scale), 1)), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def read_thumbnail_frame(cap, seek_sec: float = 1.0, max_size: tuple[int, int] | None = THUMB_SIZE):
+    """Возвращает BGR-кадр (numpy) на отметке ``seek_sec``, уменьшенный до ``max_size``, или None."""
+    import cv2  # pylint: disable=import-error
+
+    # Переходим к нужному времени, если возможно
+    cap.set(cv2.CAP_PROP_POS_MSEC, seek_sec * 1000)
+    ret, frame = cap.read()
+    if not ret or frame is None:
+        return None
+    return _fit_size(frame, max_size)
+
+
+def frame_score(frame) -> float:
+    """Насколько кадр годится в превью: контраст яркости со штрафом за тёмные и пересвеченные кадры.
+
+    Чёрный кадр и однотонная заставка дают ~0, заставка с логотипом на
+    тёмном фоне – мало (большая доля почти чёрных пикселей).
+    """
+    import numpy as np  # pylint: disable=import-error
+
+    # BGR -> яркость (BT.601) одной матричной операцией
+    luma = frame.reshape(-1, 3).astype(np.float32) @ np.array([0.114, 0.587, 0.299], dtype=np.float32)
+    mean = float(luma.mean())
+    contrast = float(luma.std())
+    dark = float((luma < 24).mean())
+    exposure = 1.0 - abs(mean - 128.0) / 128.0
+    return contrast * (1.0 - dark) * (0.5 + 0.5 * exposure)
+
+
+def _advance_to(cap, position: int, target: int, max_gap: int = GRAB_SEEK_GAP) -> int | None:
+    """Ставит ``cap`` перед кадром ``target``; ``position`` – номер кадра, который вернёт следующий grab().
+
+    Кадры ближе ``max_gap`` пропускаются через ``grab()`` (без перевода в BGR),
+    далёкие и назад – перемоткой. Возвращает новую позицию или None, если файл кончился.
+    """
+    import cv2  # pylint: disable=import-error
+
+    if target < position or target - position > max_gap:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        return target
+    while position < target:
+        if not cap.grab():
+            return None
+        position += 1
+    return position
+
+
+def select_thumbnail_frame(cap, max_size: tuple[int, int] | None = THUMB_SIZE,
+                           fps: float | None = None, frame_count: int | None = None):
+    """Лучший по ``frame_score`` из нескольких кадров-кандидатов (BGR, уменьшенный до ``max_size``) или None.
+
+    Кандидаты обходятся по возрастанию; поиск останавливается на первом
+    кадре с оценкой не ниже THUMB_GOOD_SCORE. Без частоты кадров и их
+    числа – как раньше, кадр на THUMB_FIRST_SEC. ``fps``/``frame_count``,
+    если уже известны (из заголовков), не запрашиваются у ``cap``.
+    """
+    import cv2  # pylint: disable=import-error
+
+    fps = fps or cap.get(cv2.CAP_PROP_FPS) or 0
+    frame_count = int(frame_count or cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    if fps <= 0 or frame_count <= 0:
+        return read_thumbnail_frame(cap, THUMB_FIRST_SEC, max_size)
+    targets = {min(int(THUMB_FIRST_SEC * fps), frame_count - 1)}
+    targets.update(int(fraction * frame_count) for fraction in THUMB_CANDIDATES)
+    best, best_score = None, -1.0
+    position = 0
+    for target in sorted(targets):
+        # Кандидаты разнесены далеко: grab() только в пределах полсекунды, дальше – перемотка
+        position = _advance_to(cap, position, target, max_gap=int(fps / 2))
+        if position is None or not cap.grab():
+            break
+        position += 1
+        ok, frame = cap.retrieve()
+        if not ok or frame is None:
+            break
+        score = frame_score(cv2.resize(frame, THUMB_SCORE_SIZE, interpolation=cv2.INTER_AREA))
+        if score > best_score:
+            best, best_score = frame, score
+        if score >= THUMB_GOOD_SCORE:
+            break
+    return _fit_size(best, max_size) if best is not None else None
+
+
+def probe_video(file_path: str, seek_sec: float | None = None) -> dict:
+    """Метаданные и превью за одно открытие файла.
+
+    Длительность, размер и частота берутся из заголовков контейнера (см.
+    ``containers``); если их там хватает, OpenCV только извлекает превью,
+    иначе ещё и дочитывает недостающие метаданные.
+
+    Возвращает словарь с ключами ``file_path``, ``ok``, метаданными
+    (см. ``read_metadata``), ``file_size``/``mtime``, ``thumbnail`` –
+    JPEG-байты превью или None – и ``thumbnail_sec``, время выбора и
+    сжатия превью. Без ``seek_sec`` кадр выбирается ``select_thumbnail_frame``.
+    В процессе пула импорта при включённой трассировке добавляется ``trace``
+    – события для ``tracing.merge``.
+    """
+    with tracing.span("probe_video", "import", file=os.path.basename(file_path)):
+        result = _probe_video(file_path, seek_sec)
+    trace = tracing.drain()
+    if trace is not None:
+        result["trace"] = trace
+    return result
+
+
+def _probe_video(file_path: str, seek_sec: float | None) -> dict:
+    result = {"file_path": file_path, "ok": False, "thumbnail": None}
+    try:
+        st = os.stat(file_path)
+        result.update(file_size=st.st_size, mtime=st.st_mtime)
+    except OSError:
+        return result
+    try:
+        import cv2  # pylint: disable=import-error
+
+        with tracing.span("read_header", "import"):
+            header = containers.read_header(file_path)
+        with tracing.span("open", "import"):
+            cap = cv2.VideoCapture(file_path)
+        if not cap.isOpened():
+            return result
+        try:
+            if containers.is_complete(header):
+                metadata = merge_metadata(header, dict.fromkeys(containers.HEADER_KEYS))
+                if not metadata["codec"]:
+                    metadata["codec"] = _fourcc_to_str(int(cap.get(cv2.CAP_PROP_FOURCC)))
+            else:
+                metadata = merge_metadata(header, read_metadata(cap))
+            result.update(metadata)
+            started = time.perf_counter()
+            with tracing.span("thumbnail", "import"):
+                if seek_sec is not None:
+                    frame = read_thumbnail_frame(cap, seek_sec)
+                else:
+                    frame = select_thumbnail_frame(cap, fps=metadata["fps"], frame_count=metadata["frame_count"])
+        finally:
+            cap.release()
+        result["ok"] = True
+        if frame is not None:
+            with tracing.span("encode", "import"):
+                ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+            if ok:
+                result["thumbnail"] = buf.tobytes()
+        result["thumbnail_sec"] = time.perf_counter() - started
+    except Exception:
+        pass
+    return result
+
+
+def sprite_frame_indices(frame_count: int, count: int = SPRITE_COUNT) -> list[int]:
+    """Номера кадров для листа превью: середины ``count`` равных отрезков ролика."""
+    count = min(count, frame_count)
+    return [int((i + 0.5) * frame_count / count) for i in range(count)]
+
+
+def sprite_tile_index(fraction: float, count: int = SPRITE_COUNT) -> int:
+    """Номер кадра листа для позиции ``fraction`` (0..1) на шкале времени."""
+    return max(0, min(int(fraction * count), count - 1))
+
+
+def sprite_layout(tiles: int, columns: int = SPRITE_COLUMNS) -> tuple[int, int]:
+    """(столбцы, строки) листа из ``tiles`` кадров.
+
+    Сетка всегда заполнена целиком: если кадры не делятся на ``columns``,
+    лист – одна строка. Поэтому число кадров восстанавливается по размеру
+    листа, и хранить его отдельно не нужно.
+    """
+    if tiles % columns:
+        return tiles, 1
+    return columns, tiles // columns
+
+
+def sprite_tile_rect(sheet_size: tuple[int, int], fraction: float,
+                     tile_size: tuple[int, int] = SPRITE_TILE) -> tuple[int, int, int, int]:
+    """(x, y, ширина, высота) кадра листа размера ``sheet_size`` для позиции ``fraction`` (0..1)."""
+    tw, th = tile_size
+    columns, rows = max(sheet_size[0] // tw, 1), max(sheet_size[1] // th, 1)
+    row, col = divmod(sprite_tile_index(fraction, columns * rows), columns)
+    return col * tw, row * th, tw, th
+
+
+def _fit_tile(frame, tile_size: tuple[int, int]):
+    """Вписывает кадр в клетку листа с чёрными полями."""
+    import cv2  # pylint: disable=import-error
+    import numpy as np  # pylint: disable=import-error
+
+    tw, th = tile_size
+    h, w = frame.shape[:2]
+    scale = min(tw / w, th / h)
+    nw, nh = max(int(w * scale), 1), max(int(h * scale), 1)
+    tile = np.zeros((th, tw, 3), dtype=np.uint8)
+    y, x = (th - nh) // 2, (tw - nw) // 2
+    tile[y:y + nh, x:x + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_AREA)
+    return tile
+
+
+def make_sprite_sheet(file_path: str, count: int = SPRITE_COUNT, columns: int = SPRITE_COLUMNS,
+                      tile_size: tuple[int, int] = SPRITE_TILE) -> bytes | None:
+    """JPEG-лист из ``count`` равномерно расставленных кадров (у ролика короче – из всех его кадров) или None.
+
+    Файл читается последовательно: между нужными кадрами – ``grab()``, который
+    не переводит кадр в BGR; полностью декодируются (``retrieve``) только
+    кадры листа. Через длинные промежутки перематываем – на длинных роликах
+    это дешевле, чем пропускать тысячи кадров.
+    """
+    try:
+        import cv2  # pylint: disable=import-error
+        import numpy as np  # pylint: disable=import-error
+
+        cap = cv2.VideoCapture(file_path)
+        if not cap.isOpened():
+            return None
+        try:
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            if frame_count <= 0:
+                return None
+            targets = sprite_frame_indices(frame_count, count)
+            tw, th = tile_size
+            columns, rows = sprite_layout(len(targets), columns)
+            sheet = np.zeros((rows * th, columns * tw, 3), dtype=np.uint8)
+            position = 0  # номер кадра, который вернёт следующий grab()
+            for i, target in enumerate(targets):
+                position = _advance_to(cap, position, target)
+                if position is None:
+                    break
+                ok, frame = cap.read()
+                position += 1
+                if not ok or frame is None:
+                    break
+                row, col = divmod(i, columns)
+                sheet[row * th:(row + 1) * th, col * tw:(col + 1) * tw] = _fit_tile(frame, tile_size)
+        finally:
+            cap.release()
+        ok, buf = cv2.imencode(".jpg", sheet, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        return buf.tobytes() if ok else None
+    except Exception:
+        return None
@@ -0,0 +1,129 @@
+"""Сторож зависаний GUI-потока.
+
+Таймер-пульс в GUI-потоке срабатывает каждые ``interval_ms``; опоздание
+пульса – это задержка цикла событий, она попадает в гистограмму. Фоновый
+поток следит за пульсом: если его нет дольше ``threshold_ms``, он снимает
+стек главного потока (``sys._current_frames``) – то место, где тот сейчас
+занят. Когда цикл событий оживает, зависание пишется в лог с длительностью
+и вызовом из кода приложения, на котором поток стоял.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+import traceback
+from collections import Counter
+
+from PyQt6.QtCore import QObject, QTimer, Qt
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _app_frame(stack: traceback.StackSummary) -> traceback.FrameSummary | None:
+    """Самый вложенный кадр стека из файлов приложения (не Qt, не стандартной библиотеки)."""
+    for frame in reversed(stack):
+        path = os.path.abspath(frame.filename)
+        if os.path.dirname(path) == _APP_DIR and path != os.path.abspath(__file__):
+            return frame
+    return stack[-1] if stack else None
+
+
+class StallWatchdog(QObject):
+    """Измеряет задержку цикла событий и ловит зависания GUI-потока.
+
+    Создаётся и запускается в GUI-потоке. ``summary`` – гистограмма задержек
+    и самые частые места зависаний, текстом для приложения к отчёту об ошибке.
+    """
+
+    BUCKETS_MS = (16, 33, 50, 100, 250, 500, 1000, 2000)
+
+    def __init__(self, threshold_ms: int = 200, interval_ms: int = 50, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+        self.stalls: list[tuple[float, str]] = []  # длительность (с), место
+        self._main_ident = threading.get_ident()
+        self._lock = threading.Lock()
+        self._last_beat = 0.0
+        self._stack: traceback.StackSummary | None = None  # снят во время текущего зависания
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._beat)
+
+    def start(self):
+        with self._lock:
+            self._last_beat = time.perf_counter()
+        self._timer.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="StallWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Останавливает сторож и возвращает итоговую сводку."""
+        self._timer.stop()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.summary()
+
+    def _beat(self):
+        now = time.perf_counter()
+        with self._lock:
+            latency = max(now - self._last_beat - self.interval, 0.0)
+            self._last_beat = now
+            stack, self._stack = self._stack, None
+        self.histogram[self._bucket(latency * 1000)] += 1
+        if latency >= self.threshold:
+            self._report(latency, stack)
+
+    def _bucket(self, latency_ms: float) -> int:
+        for i, limit in enumerate(self.BUCKETS_MS):
+            if latency_ms < limit:
+                return i
+        return len(self.BUCKETS_MS)
+
+    def _watch(self):
+        # Фоновый поток: опрашивает чаще пульса, стек снимает один раз за зависание
+        while not self._stop.wait(self.interval / 2):
+            with self._lock:
+                overdue = time.perf_counter() - self._last_beat - self.interval
+                if self._stack is not None or overdue < self.threshold:
+                    continue
+                frame = sys._current_frames().get(self._main_ident)  # pylint: disable=protected-access
+                if frame is not None:
+                    self._stack = traceback.extract_stack(frame)
+
+    def _report(self, latency: float, stack: traceback.StackSummary | None):
+        site_frame = _app_frame(stack) if stack else None
+        site = f"{os.path.basename(site_frame.filename)}:{site_frame.lineno} {site_frame.name}" if site_frame else "?"
+        self.stalls.append((latency, site))
+        details = "".join(traceback.format_list(stack[-12:])) if stack else ""
+        logger.warning("Главный поток не отвечал %.0f мс: %s\n%s", latency * 1000, site, details)
+
+    def summary(self) -> str:
+        total = sum(self.histogram)
+        lines = [f"Задержка цикла событий (пульсов: {total}, порог зависания {self.threshold * 1000:.0f} мс):"]
+        lower = 0
+        for limit, count in zip(self.BUCKETS_MS + (None,), self.histogram):
+            label = f"{lower}–{limit} мс" if limit is not None else f"≥{lower} мс"
+            share = count / total * 100 if total else 0.0
+            lines.append(f"  {label:>12}: {count:6d} ({share:5.1f}%)")
+            lower = limit
+        if self.stalls:
+            durations = Counter()
+            counts = Counter()
+            for latency, site in self.stalls:
+                durations[site] += latency
+                counts[site] += 1
+            lines.append(f"Зависания: {len(self.stalls)}, всего {sum(durations.values()) * 1000:.0f} мс")
+            for site, duration in durations.most_common(10):
+                lines.append(f"  {duration * 1000:8.0f} мс  x{counts[site]:<4d} {site}")
+        return "\n".join(lines)
@@ -0,0 +1,76 @@
+import database
+from conversion import ConversionJob, ConversionQueue, ThroughputMeter
+
+
+def _add_video(db: database.VideoDatabase, file_path: str) -> int:
+    row = ("clip", "00:10", "320x180", file_path, 10.0, 320, 180, 25.0, 250, 1000, 0.0, "MJPG")
+    return db.insert_many([row])[0]
+
+
+def _finished_proxy_job(queue: ConversionQueue, video_id: int, output_path) -> ConversionJob:
+    # Очередь на паузе: задание не стартует, завершение имитируем сигналом воркера
+    queue.set_paused(True)
+    job = queue.enqueue_proxy(video_id, "/videos/clip.avi", str(output_path), 540)
+    queue._set_status(job, ConversionJob.RUNNING)  # pylint: disable=protected-access
+    output_path.write_bytes(b"proxy")
+    queue._on_finished(job.id, True)  # pylint: disable=protected-access
+    return job
+
+
+def test_proxy_linked_to_existing_video(tmp_path):
+    db = database.VideoDatabase(str(tmp_path / "library.db"))
+    queue = ConversionQueue(db)
+    video_id = _add_video(db, "/videos/clip.avi")
+    ready = []
+    queue.proxyReady.connect(lambda vid, path: ready.append((vid, path)))
+    output = tmp_path / "clip_540p.mp4"
+
+    job = _finished_proxy_job(queue, video_id, output)
+
+    assert job.status == ConversionJob.DONE
+    assert db.select_proxies() == {video_id: str(output)}
+    assert ready == [(video_id, str(output))]
+    assert output.exists()
+
+
+def test_proxy_of_deleted_video_is_discarded(tmp_path):
+    db = database.VideoDatabase(str(tmp_path / "library.db"))
+    queue = ConversionQueue(db)
+    video_id = _add_video(db, "/videos/clip.avi")
+    ready = []
+    queue.proxyReady.connect(lambda vid, path: ready.append((vid, path)))
+    db.delete_many_ids([video_id])  # пользователь удалил видео, пока строился прокси
+    output = tmp_path / "clip_540p.mp4"
+
+    _finished_proxy_job(queue, video_id, output)
+
+    assert db.select_proxies() == {}
+    assert ready == []
+    assert not output.exists()
+
+
+def test_meter_ignores_paused_time():
+    meter = ThroughputMeter()
+    meter.update(0, now=0.0)
+    assert meter.update(10, now=1.0) == 10.0
+    meter.pause(now=1.0)
+    meter.update(10, now=5.0)  # отчёты на паузе не меняют оценку
+    meter.resume(now=11.0)
+    # 10 единиц за 1 с работы после паузы, а не за 11 с с последнего отчёта
+    assert meter.update(20, now=12.0) == 10.0
+
+
+def test_failed_job_counts_as_finished_in_aggregate(tmp_path):
+    db = database.VideoDatabase(str(tmp_path / "library.db"))
+    queue = ConversionQueue(db)
+    queue.set_paused(True)
+    done = queue.enqueue("/videos/a.avi", str(tmp_path / "a.mp4"), "mp4")
+    failed = queue.enqueue("/videos/b.avi", str(tmp_path / "b.mp4"), "mp4")
+    for job in (done, failed):
+        queue._set_status(job, ConversionJob.RUNNING)  # pylint: disable=protected-access
+    failed.progress = 40
+
+    queue._on_finished(done.id, True)  # pylint: disable=protected-access
+    queue._on_finished(failed.id, False)  # pylint: disable=protected-access
+
+    assert queue.aggregate_progress() == 100
@@ -0,0 +1,49 @@
+import pytest
+
+import probe
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+
+def _write_clip(path, frames: int, size=(64, 36), fps=25.0):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    assert writer.isOpened()
+    for i in range(frames):
+        # Кадры различимы по яркости: i-й кадр – значение 40 + 4 * i
+        writer.write(np.full((size[1], size[0], 3), 40 + 4 * i, dtype=np.uint8))
+    writer.release()
+
+
+def _decode(data: bytes):
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+@pytest.mark.parametrize("tiles, layout", [(50, (10, 5)), (12, (12, 1)), (20, (10, 2)), (1, (1, 1))])
+def test_sprite_layout_is_full_grid(tiles, layout):
+    columns, rows = probe.sprite_layout(tiles)
+    assert (columns, rows) == layout
+    assert columns * rows == tiles
+
+
+def test_short_clip_sprite_has_no_empty_tiles(tmp_path):
+    clip = tmp_path / "short.avi"
+    _write_clip(clip, 12)
+
+    sheet = _decode(probe.make_sprite_sheet(str(clip)))
+
+    tw, th = probe.SPRITE_TILE
+    assert sheet.shape[:2] == (th, 12 * tw)
+    # Позиция у самого конца шкалы – последний кадр ролика, а не пустая клетка
+    x, y, w, h = probe.sprite_tile_rect((sheet.shape[1], sheet.shape[0]), 0.99)
+    assert (x, y) == (11 * tw, 0)
+    tile = sheet[y:y + h, x:x + w]
+    assert abs(float(tile[th // 2, tw // 2].mean()) - (40 + 4 * 11)) < 8
+
+
+def test_full_sprite_tile_rect():
+    tw, th = probe.SPRITE_TILE
+    size = (probe.SPRITE_COLUMNS * tw, 5 * th)
+    assert probe.sprite_tile_rect(size, 0.0) == (0, 0, tw, th)
+    assert probe.sprite_tile_rect(size, 1.0) == (9 * tw, 4 * th, tw, th)
+    assert probe.sprite_tile_rect(size, 0.5) == (5 * tw, 2 * th, tw, th)
@@ -0,0 +1,259 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage, QPixmap
+
+import probe
+
+
+class ThumbnailCache:
+    """Дисковый кэш превью: маленькие JPEG рядом с базой данных.
+
+    Ключ записи – хэш от (путь, размер, mtime), поэтому изменённый файл
+    автоматически получает новый ключ, а старая запись удаляется.
+    Общий объём ограничен ``max_bytes``, лишнее вытесняется по LRU.
+    Кроме превью (``kind=""``) здесь же хранятся листы кадров для
+    перемотки (``kind=SPRITE``) – у них своя запись на тот же файл.
+    """
+
+    SPRITE = "_sprite2"  # 2: у коротких роликов лист без пустых клеток (probe.sprite_layout)
+    KINDS = ("", SPRITE)
+
+    THUMB_SIZE = probe.THUMB_SIZE  # с запасом для HiDPI, в сетке рисуем 160x90
+    JPEG_QUALITY = probe.JPEG_QUALITY
+
+    def __init__(self, directory: str, max_bytes: int = 200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # path_hash -> (имя файла, размер в байтах); порядок = от старых к новым
+        self._entries: OrderedDict[str, tuple[str, int]] = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    # ---------- Ключи ----------
+
+    @staticmethod
+    def _path_hash(file_path: str) -> str:
+        return hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _version_hash(st: os.stat_result) -> str:
+        return hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:16]
+
+    def _file_name(self, file_path: str, st: os.stat_result, kind: str = "") -> tuple[str, str]:
+        """(ключ записи, имя файла); ключ – хэш пути с суффиксом вида записи."""
+        key = self._path_hash(file_path) + kind
+        return key, f"{key}-{self._version_hash(st)}.jpg"
+
+    def _load_index(self):
+        """Строит индекс по содержимому каталога; давно не использованные – первыми."""
+        found = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.is_file() or not entry.name.endswith(".jpg"):
+                        continue
+                    path_hash = entry.name.split("-", 1)[0]
+                    st = entry.stat()
+                    found.append((st.st_mtime, path_hash, entry.name, st.st_size))
+        except OSError:
+            return
+        found.sort()
+        for _, path_hash, name, size in found:
+            old = self._entries.pop(path_hash, None)
+            if old is not None:
+                # Две версии одного файла – оставляем свежую, старую удаляем
+                self._remove_file(old[0])
+                self._total_bytes -= old[1]
+            self._entries[path_hash] = (name, size)
+            self._total_bytes += size
+
+    def _remove_file(self, name: str):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    # ---------- Публичный интерфейс ----------
+
+    def get_image(self, file_path: str, kind: str = "") -> QImage | None:
+        """Возвращает превью из кэша или None, если записи нет или она устарела.
+        QImage, а не QPixmap – безопасно вызывать из фоновых потоков."""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        path_hash, name = self._file_name(file_path, st, kind)
+        with self._lock:
+            entry = self._entries.get(path_hash)
+            if entry is None:
+                return None
+            if entry[0] != name:
+                # Файл изменился после создания превью
+                self._entries.pop(path_hash)
+                self._total_bytes -= entry[1]
+                self._remove_file(entry[0])
+                return None
+            self._entries.move_to_end(path_hash)
+        full_path = os.path.join(self.directory, name)
+        image = QImage(full_path)
+        if image.isNull():
+            self._drop(path_hash)
+            return None
+        try:
+            os.utime(full_path)  # сохраняем порядок LRU между запусками
+        except OSError:
+            pass
+        return image
+
+    def put(self, file_path: str, image: QImage | QPixmap) -> None:
+        """Сохраняет уменьшенную копию превью и при необходимости вытесняет старые."""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return
+        if isinstance(image, QPixmap):
+            image = image.toImage()
+        if image.isNull():
+            return
+        w, h = self.THUMB_SIZE
+        if image.width() > w or image.height() > h:
+            image = image.scaled(w, h, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+        path_hash, name = self._file_name(file_path, st)
+        full_path = os.path.join(self.directory, name)
+        tmp_path = full_path + ".tmp"
+        if not image.save(tmp_path, "JPG", self.JPEG_QUALITY):
+            self._remove_file(os.path.basename(tmp_path))
+            return
+        os.replace(tmp_path, full_path)
+        self._register(path_hash, name, os.path.getsize(full_path))
+
+    def put_encoded(self, file_path: str, jpeg_bytes: bytes, kind: str = "") -> None:
+        """Сохраняет уже сжатое превью (например, полученное из процесса импорта) без перекодирования."""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return
+        path_hash, name = self._file_name(file_path, st, kind)
+        full_path = os.path.join(self.directory, name)
+        tmp_path = full_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(jpeg_bytes)
+            os.replace(tmp_path, full_path)
+        except OSError:
+            self._remove_file(os.path.basename(tmp_path))
+            return
+        self._register(path_hash, name, len(jpeg_bytes))
+
+    def _register(self, path_hash: str, name: str, size: int):
+        with self._lock:
+            old = self._entries.pop(path_hash, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+                if old[0] != name:
+                    self._remove_file(old[0])
+            self._entries[path_hash] = (name, size)
+            self._total_bytes += size
+            self._evict()
+
+    def invalidate(self, file_path: str) -> None:
+        """Удаляет превью и лист кадров файла (например, при удалении видео из библиотеки)."""
+        path_hash = self._path_hash(file_path)
+        for kind in self.KINDS:
+            self._drop(path_hash + kind)
+
+    def _drop(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+                self._remove_file(entry[0])
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (name, size) = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._remove_file(name)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+
+class ThumbnailMemoryCache:
+    """Общий для всех видео кэш готовых к отрисовке превью в памяти.
+
+    Хранит QPixmap размера сетки по ключу (``Video.thumbnail_key``) и
+    ограничен бюджетом в байтах: давно не запрошенные превью вытесняются
+    по LRU и при следующем показе заново читаются с диска. Используется
+    только из GUI-потока.
+    """
+
+    DISPLAY_SIZE = (160, 90)
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, display_size: tuple[int, int] | None = DISPLAY_SIZE):
+        self.max_bytes = max_bytes
+        # None – хранить как есть (листы кадров уже нужного размера)
+        self.display_size = display_size
+        self._pixmaps: OrderedDict[str, tuple[QPixmap, int]] = OrderedDict()
+        self._failed: set[str] = set()  # ключи, для которых извлечь кадр не удалось
+        self._total_bytes = 0
+
+    @staticmethod
+    def _cost(pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def get(self, key: str | None) -> QPixmap | None:
+        entry = self._pixmaps.get(key) if key is not None else None
+        if entry is None:
+            return None
+        self._pixmaps.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, image: QImage | QPixmap) -> QPixmap:
+        """Уменьшает изображение до размера сетки (если он задан) и кладёт в кэш."""
+        pixmap = image if isinstance(image, QPixmap) else QPixmap.fromImage(image)
+        if self.display_size is not None:
+            w, h = self.display_size
+            if pixmap.width() > w or pixmap.height() > h:
+                pixmap = pixmap.scaled(w, h, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        self.discard(key)
+        cost = self._cost(pixmap)
+        self._pixmaps[key] = (pixmap, cost)
+        self._total_bytes += cost
+        while self._total_bytes > self.max_bytes and len(self._pixmaps) > 1:
+            _, (_, old_cost) = self._pixmaps.popitem(last=False)
+            self._total_bytes -= old_cost
+        return pixmap
+
+    def contains(self, key: str | None) -> bool:
+        return key in self._pixmaps
+
+    def mark_failed(self, key: str) -> None:
+        self._failed.add(key)
+
+    def is_failed(self, key: str | None) -> bool:
+        return key in self._failed
+
+    def discard(self, key: str | None) -> None:
+        """Забывает превью (и признак ошибки), например после изменения или удаления файла."""
+        self._failed.discard(key)
+        entry = self._pixmaps.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+
+def sprite_tile(sheet: QPixmap, fraction: float) -> QPixmap:
+    """Кадр листа перемотки для позиции ``fraction`` (0..1); число кадров – по размеру листа."""
+    return sheet.copy(*probe.sprite_tile_rect((sheet.width(), sheet.height()), fraction))
@@ -0,0 +1,191 @@
+"""Трассировка горячих путей в формате Chrome trace (chrome://tracing, ui.perfetto.dev).
+
+Включается переменной окружения ``VIDEOTEKA_TRACE``: ``1`` – файл
+``trace.json`` в текущем каталоге, любое другое значение – путь к файлу.
+Файл пишется при выходе из программы. Каждый интервал – событие ``X``
+с потоком, в котором он выполнялся; потоки подписаны именами QThread
+(``objectName``) или ``threading``.
+
+Процессы пула импорта файл не пишут: события задания забираются
+``drain`` и возвращаются вместе с результатом, основной процесс
+добавляет их ``merge`` – в трассе это отдельные процессы.
+
+Выключенная трассировка ничего не стоит: ``traced`` и ``trace_methods``
+возвращают функции и классы как есть, ``span`` – общий пустой контекст.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import inspect
+import functools
+import itertools
+import threading
+import multiprocessing
+
+_SETTING = os.environ.get("VIDEOTEKA_TRACE", "")
+ENABLED = bool(_SETTING)
+TRACE_PATH = ("trace.json" if _SETTING == "1" else _SETTING) if ENABLED else None
+# Предел числа событий: при долгой записи трассы память не растёт бесконечно
+MAX_EVENTS = 2_000_000
+
+_PID = os.getpid()
+_T0 = time.perf_counter_ns()
+_events: list[dict] = []  # list.append атомарен – пишут все потоки без блокировки
+# (идентификатор потока ОС, имя) -> номер дорожки: ОС переиспользует идентификаторы
+# завершённых потоков, а у последовательных заданий очереди разные имена
+_tracks: dict[tuple[int, str], int] = {}
+_track_numbers = itertools.count(1)
+_process_named = False  # дочерний процесс уже передал своё имя
+
+
+def _in_main_process() -> bool:
+    # Проверяется при вызове: пока spawn импортирует модули дочернего процесса,
+    # parent_process() ещё не установлен
+    return multiprocessing.parent_process() is None
+
+
+def _thread_name() -> str:
+    # Qt не импортируем сами: процессы пула импорта работают без него
+    if "PyQt6.QtCore" in sys.modules:
+        from PyQt6.QtCore import QThread
+
+        name = QThread.currentThread().objectName()
+        if name:
+            return name
+    return threading.current_thread().name
+
+
+def _tid() -> int:
+    key = (threading.get_ident(), _thread_name())
+    tid = _tracks.get(key)
+    if tid is None:
+        # Ключ с идентификатором текущего потока добавляет только он сам – гонки нет
+        tid = _tracks[key] = next(_track_numbers)
+        _events.append({"ph": "M", "name": "thread_name", "pid": _PID, "tid": tid, "args": {"name": key[1]}})
+    return tid
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "_start")
+
+    def __init__(self, name: str, cat: str, args: dict | None):
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        if len(_events) < MAX_EVENTS:
+            event = {"ph": "X", "name": self.name, "cat": self.cat, "pid": _PID, "tid": _tid(),
+                     "ts": (self._start - _T0) / 1000, "dur": (end - self._start) / 1000}
+            if self.args:
+                event["args"] = self.args
+            _events.append(event)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, cat: str = "app", **args):
+    """Контекст-интервал ``with span("read"): ...``; ``args`` попадут в событие."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+
+def traced(name: str | None = None, cat: str = "app"):
+    """Декоратор: каждый вызов функции – интервал (по умолчанию с её ``__qualname__``)."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Span(label, cat, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def trace_methods(cat: str):
+    """Декоратор класса: трассирует его публичные методы.
+
+    Генераторы и контекстные менеджеры пропускаются – вызов только создаёт
+    объект, а работа идёт позже, внутри других (уже трассируемых) методов.
+    """
+    def decorate(cls):
+        if not ENABLED:
+            return cls
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or not inspect.isfunction(value):
+                continue
+            if inspect.isgeneratorfunction(inspect.unwrap(value)):
+                continue
+            setattr(cls, attr, traced(f"{cls.__name__}.{attr}", cat)(value))
+        return cls
+    return decorate
+
+
+def drain() -> dict | None:
+    """В дочернем процессе – забирает накопленные события для передачи в основной (``merge``).
+
+    В основном процессе и без трассировки возвращает None.
+    """
+    global _process_named
+    if not ENABLED or _in_main_process() or not _events:
+        return None
+    events = _events[:]
+    del _events[:len(events)]
+    if not _process_named:
+        _process_named = True
+        events.insert(0, {"ph": "M", "name": "process_name", "pid": _PID, "args": {"name": f"import-worker-{_PID}"}})
+    return {"t0": _T0, "events": events}
+
+
+def merge(batch: dict | None) -> None:
+    """Добавляет события дочернего процесса, полученные от ``drain``.
+
+    perf_counter общий для всех процессов машины, поэтому отметки времени
+    достаточно сдвинуть на разницу точек отсчёта.
+    """
+    if not batch or not ENABLED:
+        return
+    shift = (batch["t0"] - _T0) / 1000
+    for event in batch["events"]:
+        if len(_events) >= MAX_EVENTS:
+            break
+        if "ts" in event:
+            event["ts"] += shift
+        _events.append(event)
+
+
+def write(path: str | None = None) -> None:
+    """Сохраняет накопленные события (при включённой трассировке вызывается при выходе)."""
+    path = path or TRACE_PATH
+    if path is None or not _in_main_process():
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": list(_events), "displayTimeUnit": "ms"}, f)
+
+
+if ENABLED:
+    atexit.register(write)
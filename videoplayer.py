@@ -1,5 +1,9 @@
-from PyQt6.QtGui import QIcon, QFont, QAction
-from PyQt6.QtCore import Qt, QUrl, QSize
+import bisect
+import logging
+import time
+
+from PyQt6.QtGui import QIcon, QFont, QAction, QPixmap
+from PyQt6.QtCore import Qt, QUrl, QSize, QTimer
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PyQt6.QtMultimediaWidgets import QVideoWidget
 from PyQt6.QtWidgets import (
@@ -8,9 +12,34 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import pyqtSignal, QPoint, QPointF
 
+from thumbcache import sprite_tile
+
+logger = logging.getLogger(__name__)
+
 
 class ClickableSlider(QSlider):
-    """QSlider, реагирующий на клик по треку – сразу переходит к позиции."""
+    """QSlider, реагирующий на клик по треку – сразу переходит к позиции.
+
+    При наведении сообщает значение под курсором (``hoverMoved``) – для превью кадра.
+    """
+
+    hoverMoved = pyqtSignal(int, QPoint)  # значение под курсором, глобальная позиция курсора
+    hoverLeft = pyqtSignal()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setMouseTracking(True)
+
+    def mouseMoveEvent(self, event):  # noqa: N802  – PyQt naming
+        if self.orientation() == Qt.Orientation.Horizontal and self.maximum() > self.minimum():
+            pos = event.position().toPoint()
+            value = QStyle.sliderValueFromPosition(self.minimum(), self.maximum(), pos.x(), self.width())
+            self.hoverMoved.emit(value, self.mapToGlobal(pos))
+        super().mouseMoveEvent(event)
+
+    def leaveEvent(self, event):  # noqa: N802  – PyQt naming
+        self.hoverLeft.emit()
+        super().leaveEvent(event)
 
     def mousePressEvent(self, event):  # noqa: N802  – PyQt naming
         if event.button() == Qt.MouseButton.LeftButton:
@@ -25,7 +54,98 @@ class ClickableSlider(QSlider):
         super().mousePressEvent(event)
 
 
+class PlaybackMetrics:
+    """Замеры открытия и воспроизведения одного источника (секунды по ``time.perf_counter``).
+
+    ``load`` – от ``setSource`` до загруженного медиа, ``first_frame`` – от
+    запроса на открытие (двойной клик) до первого кадра, ``first_seek`` – от
+    первой перемотки до кадра после неё. Зависание – пауза между кадрами
+    больше ``STALL_SEC`` во время воспроизведения (перемотки не считаются).
+    """
+
+    STALL_SEC = 0.25
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.source_at: float | None = None
+        self.open_at: float | None = None
+        self.load: float | None = None
+        self.first_frame: float | None = None
+        self.first_seek: float | None = None
+        self.frames = 0
+        self.prewarmed = False
+        self.stalls: list[float] = []
+        self._seek_at: float | None = None
+        self._last_frame: float | None = None
+
+    def source_set(self, now: float):
+        self.reset()
+        self.source_at = self.open_at = now
+
+    def open_requested(self, now: float):
+        """Окно показано пользователю; при прогреве источник мог быть задан намного раньше."""
+        self.open_at = now
+        if self.frames:
+            # Прогретый плеер уже показал кадр – пользователь ничего не ждал
+            self.prewarmed = True
+            self.first_frame = 0.0
+
+    def loaded(self, now: float):
+        if self.load is None and self.source_at is not None:
+            self.load = now - self.source_at
+
+    def seek_requested(self, now: float):
+        if self.first_seek is None and self._seek_at is None:
+            self._seek_at = now
+        # Кадр после перемотки – не зависание
+        self._last_frame = None
+
+    def playback_changed(self):
+        # После паузы промежуток до следующего кадра ничего не говорит о декодере
+        self._last_frame = None
+
+    def frame(self, now: float, playing: bool):
+        self.frames += 1
+        if self.first_frame is None and self.open_at is not None:
+            self.first_frame = now - self.open_at
+        if self._seek_at is not None:
+            self.first_seek = now - self._seek_at
+            self._seek_at = None
+        elif playing and self._last_frame is not None and now - self._last_frame > self.STALL_SEC:
+            self.stalls.append(now - self._last_frame)
+        self._last_frame = now
+
+    def summary(self) -> str:
+        def ms(value: float | None) -> str:
+            return f"{value * 1000:.0f} мс" if value is not None else "–"
+
+        stall_total = sum(self.stalls)
+        warm = " (прогрет)" if self.prewarmed else ""
+        return (f"загрузка {ms(self.load)} | первый кадр {ms(self.first_frame)}{warm} | "
+                f"перемотка {ms(self.first_seek)} | кадров {self.frames} | "
+                f"зависаний {len(self.stalls)} ({ms(stall_total)})")
+
+
 class VideoPlayer(QWidget):
+    """Окно плеера.
+
+    Перемотка объединяется: в декодер уходит не больше одного запроса за
+    ``SEEK_INTERVAL_MS``, промежуточные позиции заменяются последней. Пока
+    ползунок тянут, позиция прилипает к ближайшему ключевому кадру (если
+    индекс передан через ``set_keyframes``) – такой переход не требует
+    декодирования от предыдущего ключевого кадра. Точная перемотка – при
+    отпускании ползунка.
+
+    Замеры открытия и воспроизведения (``metrics``) снимаются с кадров,
+    приходящих в QVideoSink виджета; ``set_debug(True)`` (или F12) показывает
+    их строкой под видео, итог пишется в лог при освобождении источника.
+    """
+
+    closed = pyqtSignal(object)  # плеер закрыт и освободил медиа
+
+    SEEK_INTERVAL_MS = 100
 
     def __init__(self, parent=None):
         super(VideoPlayer, self).__init__(parent)
@@ -58,6 +178,34 @@ class VideoPlayer(QWidget):
         self.positionSlider = ClickableSlider(Qt.Orientation.Horizontal)
         self.positionSlider.setRange(0, 0)
         self.positionSlider.sliderMoved.connect(self.setPosition)
+        self.positionSlider.sliderReleased.connect(self._on_slider_released)
+        self.positionSlider.hoverMoved.connect(self.showPreview)
+        self.positionSlider.hoverLeft.connect(self.hidePreview)
+
+        # Превью кадра над шкалой: клетка листа кадров, без декодирования видео
+        self.video_data: dict = {}
+        self._preview_sprite: QPixmap | None = None
+        self.previewLabel = QLabel(self, Qt.WindowType.ToolTip)
+        self.previewLabel.setStyleSheet("border: 1px solid #505050;")
+        self.previewLabel.hide()
+
+        # Объединение перемоток: пока таймер идёт, новые позиции только запоминаются
+        self._keyframes: list[int] = []  # мс, по возрастанию
+        self._pending_seek: int | None = None
+        self._last_seek: int | None = None  # последняя отправленная в декодер позиция
+        self._seekTimer = QTimer(self)
+        self._seekTimer.setSingleShot(True)
+        self._seekTimer.setInterval(self.SEEK_INTERVAL_MS)
+        self._seekTimer.timeout.connect(self._flush_seek)
+
+        # Замеры: время до первого кадра, первой перемотки, зависания
+        self.metrics = PlaybackMetrics()
+        self.debugLabel = QLabel()
+        self.debugLabel.setFont(QFont("monospace", 7))
+        self.debugLabel.hide()
+        self._debugTimer = QTimer(self)
+        self._debugTimer.setInterval(500)
+        self._debugTimer.timeout.connect(self._update_debug_label)
 
         # Иконка динамика
         volume_icon = QLabel()
@@ -89,6 +237,7 @@ class VideoPlayer(QWidget):
 
         layout = QVBoxLayout()
         layout.addWidget(videoWidget)
+        layout.addWidget(self.debugLabel)
         layout.addLayout(controlLayout)
         layout.addWidget(self.statusBar)
 
@@ -100,6 +249,8 @@ class VideoPlayer(QWidget):
         self.mediaPlayer.positionChanged.connect(self.positionChanged)
         self.mediaPlayer.durationChanged.connect(self.durationChanged)
         self.mediaPlayer.errorChanged.connect(self.handleError)
+        self.mediaPlayer.mediaStatusChanged.connect(self._on_media_status)
+        videoWidget.videoSink().videoFrameChanged.connect(self._on_video_frame)
 
         self.audioOutput.volumeChanged.connect(self.volumeChanged)
 
@@ -114,6 +265,7 @@ class VideoPlayer(QWidget):
             self.mediaPlayer.play()
 
     def mediaStateChanged(self, state):
+        self.metrics.playback_changed()
         if self.mediaPlayer.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
             self.playButton.setIcon(
                     self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPause))
@@ -122,13 +274,50 @@ class VideoPlayer(QWidget):
                     self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
 
     def positionChanged(self, position):
-        self.positionSlider.setValue(position)
+        # Не дёргаем ползунок из-под пальца: при перетаскивании позицию задаёт пользователь
+        if not self.positionSlider.isSliderDown():
+            self.positionSlider.setValue(position)
 
     def durationChanged(self, duration):
         self.positionSlider.setRange(0, duration)
 
     def setPosition(self, position):
+        if self.positionSlider.isSliderDown():
+            position = self.snap_to_keyframe(position)
+            # Пока курсор в пределах того же ключевого кадра, повторно не перематываем
+            if position == self._last_seek and self._pending_seek is None:
+                return
+        self._request_seek(position)
+
+    def _on_slider_released(self):
+        self._request_seek(self.positionSlider.value())
+
+    def _request_seek(self, position: int):
+        self._pending_seek = position
+        if not self._seekTimer.isActive():
+            self._flush_seek()
+
+    def _flush_seek(self):
+        """Отправляет последнюю запрошенную позицию; следующая уйдёт не раньше чем через SEEK_INTERVAL_MS."""
+        if self._pending_seek is None:
+            return
+        position, self._pending_seek = self._pending_seek, None
+        self._last_seek = position
+        self.metrics.seek_requested(time.perf_counter())
         self.mediaPlayer.setPosition(position)
+        self._seekTimer.start()
+
+    def set_keyframes(self, times: list[float] | None):
+        """Индекс ключевых кадров текущего файла (секунды) для быстрой перемотки при перетаскивании."""
+        self._keyframes = sorted(int(t * 1000) for t in times or [])
+
+    def snap_to_keyframe(self, position: int) -> int:
+        """Ближайший к ``position`` (мс) ключевой кадр; без индекса – сама позиция."""
+        if not self._keyframes:
+            return position
+        i = bisect.bisect_left(self._keyframes, position)
+        candidates = self._keyframes[max(i - 1, 0):i + 1]
+        return min(candidates, key=lambda k: abs(k - position))
 
     def setVolume(self, volume):
         self.audioOutput.setVolume(volume / 100)
@@ -142,14 +331,98 @@ class VideoPlayer(QWidget):
 
     def setSource(self, url: QUrl):
         """Устанавливает источник видео и активирует кнопку воспроизведения."""
+        self.metrics.source_set(time.perf_counter())
         self.mediaPlayer.setSource(url)
         self.playButton.setEnabled(True)
 
+    def source_path(self) -> str:
+        """Локальный путь текущего источника ('' – источника нет)."""
+        return self.mediaPlayer.source().toLocalFile()
+
+    def preroll(self):
+        """Открывает источник и декодирует первый кадр без воспроизведения (прогрев перед показом)."""
+        self.mediaPlayer.pause()
+
+    def mark_opened(self):
+        """Отмечает момент, когда пользователь попросил открыть видео – от него считается первый кадр."""
+        self.metrics.open_requested(time.perf_counter())
+
+    def set_debug(self, enabled: bool):
+        self.debugLabel.setVisible(enabled)
+        if enabled:
+            self._update_debug_label()
+            self._debugTimer.start()
+        else:
+            self._debugTimer.stop()
+
+    def _update_debug_label(self):
+        self.debugLabel.setText(self.metrics.summary())
+
+    def _on_media_status(self, status):
+        if status == QMediaPlayer.MediaStatus.LoadedMedia:
+            self.metrics.loaded(time.perf_counter())
+
+    def _on_video_frame(self, frame):
+        if not frame.isValid():
+            return
+        first = self.metrics.first_frame is None
+        playing = self.mediaPlayer.playbackState() == QMediaPlayer.PlaybackState.PlayingState
+        self.metrics.frame(time.perf_counter(), playing)
+        if first and self.metrics.first_frame is not None:
+            logger.info("%s: первый кадр через %.0f мс", self.source_path(), self.metrics.first_frame * 1000)
+
+    def keyPressEvent(self, event):  # noqa: N802  – PyQt naming
+        if event.key() == Qt.Key.Key_F12:
+            self.set_debug(not self.debugLabel.isVisible())
+            return
+        super().keyPressEvent(event)
+
+    def release(self):
+        """Останавливает воспроизведение и отпускает файл и декодер; окно можно использовать снова."""
+        if self.metrics.frames:
+            logger.info("%s: %s", self.source_path(), self.metrics.summary())
+        self.mediaPlayer.stop()
+        self.mediaPlayer.setSource(QUrl())
+        self.playButton.setEnabled(False)
+        self.positionSlider.setRange(0, 0)
+        self.updateSpeed(1.0)
+        self.statusBar.clearMessage()
+        self.video_data = {}
+        self._preview_sprite = None
+        self._seekTimer.stop()
+        self._pending_seek = None
+        self._last_seek = None
+        self._keyframes = []
+        self.metrics.reset()
+        self.hidePreview()
+
+    def closeEvent(self, event):  # noqa: N802  – PyQt naming
+        self.release()
+        super().closeEvent(event)
+        self.closed.emit(self)
+
     def set_video_data(self, data: dict):
         """Получает словарь с данными о видео и выводит краткую информацию."""
+        self.video_data = data
         info = f"{data.get('title', '')} | {data.get('resolution', '')} | {data.get('duration', '')}"
         self.statusBar.showMessage(info)
 
+    def set_preview_sprite(self, sheet: QPixmap | None):
+        """Лист кадров текущего видео для превью при наведении на шкалу."""
+        self._preview_sprite = sheet
+
+    def showPreview(self, value: int, global_pos: QPoint):
+        if self._preview_sprite is None or self.positionSlider.maximum() <= 0:
+            return
+        tile = sprite_tile(self._preview_sprite, value / self.positionSlider.maximum())
+        self.previewLabel.setPixmap(tile)
+        self.previewLabel.adjustSize()
+        self.previewLabel.move(global_pos.x() - tile.width() // 2, global_pos.y() - tile.height() - 16)
+        self.previewLabel.show()
+
+    def hidePreview(self):
+        self.previewLabel.hide()
+
     def apply_styles(self):
         """Применяет современную тему оформления к элементам плеера."""
         self.setStyleSheet("""
@@ -288,6 +561,97 @@ class VideoPlayer(QWidget):
 
 # ----- SpeedDialog класс больше не нужен; удалён -----
 
+
+class PlayerPool:
+    """Пул окон плеера.
+
+    Закрытый плеер освобождает медиа и остаётся скрытым в запасе (не больше
+    ``max_idle``) – следующее открытие не создаёт заново QMediaPlayer,
+    аудиовыход и виджет видео. Одновременно открыто не больше ``max_open``
+    окон: при превышении закрывается то, что открыто раньше всех.
+
+    ``prewarm`` заранее открывает файл в скрытом плеере (он один); если
+    следующий ``acquire`` просит тот же файл, отдаётся этот плеер с уже
+    декодированным первым кадром.
+    """
+
+    def __init__(self, max_open: int = 4, max_idle: int = 2, factory=None):
+        self.max_open = max_open
+        self.max_idle = max_idle
+        self._factory = factory or VideoPlayer
+        self._open: list[VideoPlayer] = []  # в порядке открытия
+        self._idle: list[VideoPlayer] = []
+        self._warm: tuple[str, VideoPlayer] | None = None  # путь, скрытый плеер с открытым файлом
+
+    @property
+    def open_players(self) -> list['VideoPlayer']:
+        return list(self._open)
+
+    def acquire(self, file_path: str | None = None) -> 'VideoPlayer':
+        """Плеер для нового видео: прогретый для ``file_path``, из запаса или новый.
+
+        Источник прогретого плеера уже задан (см. ``VideoPlayer.source_path``).
+        Показывает плеер вызывающий код.
+        """
+        while self.max_open and len(self._open) >= self.max_open:
+            self._close(self._open[0])
+        if self._warm is not None and file_path is not None and self._warm[0] == file_path:
+            player = self._warm[1]
+            self._warm = None
+        else:
+            player = self._take()
+        self._open.append(player)
+        return player
+
+    def prewarm(self, file_path: str):
+        """Открывает файл в скрытом плеере, чтобы двойной клик показал видео сразу."""
+        if self._warm is not None:
+            if self._warm[0] == file_path:
+                return
+            player = self._warm[1]
+        else:
+            player = self._take()
+        player.setSource(QUrl.fromLocalFile(file_path))
+        player.preroll()
+        self._warm = (file_path, player)
+
+    def _take(self) -> 'VideoPlayer':
+        if self._idle:
+            return self._idle.pop()
+        player = self._factory()
+        player.closed.connect(self._on_closed)
+        return player
+
+    def _close(self, player: 'VideoPlayer'):
+        # close() вернёт плеер в запас через сигнал closed; скрытое окно closeEvent
+        # не получает – тогда освобождаем его сами
+        player.close()
+        if player in self._open:
+            player.release()
+            self._on_closed(player)
+
+    def _on_closed(self, player: 'VideoPlayer'):
+        if player in self._open:
+            self._open.remove(player)
+        if player in self._idle:
+            return
+        if len(self._idle) < self.max_idle:
+            self._idle.append(player)
+        else:
+            player.deleteLater()
+
+    def shutdown(self):
+        """Закрывает все окна и удаляет плееры."""
+        for player in list(self._open):
+            self._close(player)
+        if self._warm is not None:
+            self._warm[1].release()
+            self._warm[1].deleteLater()
+            self._warm = None
+        for player in self._idle:
+            player.deleteLater()
+        self._idle.clear()
+
 if __name__ == '__main__':
     import sys
     app = QApplication(sys.argv)
@@ -0,0 +1,321 @@
+import os
+import sqlite3
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage
+
+import probe
+import database
+import tracing
+
+
+class _DrainRunnable(QRunnable):
+    """Задача пула: забирает пути из общей очереди, пока она не опустеет."""
+
+    def __init__(self, loader: 'ThumbnailLoader'):
+        super().__init__()
+        self._loader = loader
+
+    def run(self):
+        self._loader._drain()
+
+
+class ThumbnailLoader(QObject):
+    """Фоновая загрузка превью пулом потоков.
+
+    Очередь всегда содержит только то, что сейчас нужно показать: при
+    прокрутке ``set_visible`` заменяет её новым набором путей (первые –
+    важнее), а задания для ушедших из вида элементов отбрасываются.
+    """
+
+    thumbnailReady = pyqtSignal(str, QImage)  # путь, превью (пустое при ошибке)
+
+    def __init__(self, load_func: Callable[[str], QImage | None], max_workers: int | None = None, parent=None):
+        super().__init__(parent)
+        self._load_func = load_func
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_workers or min(4, os.cpu_count() or 1))
+        self._lock = threading.Lock()
+        self._queue: deque[str] = deque()
+        self._queued: set[str] = set()
+        self._in_flight: set[str] = set()
+        self._active_runners = 0
+        self._stopped = False
+
+    def set_visible(self, file_paths: list[str]) -> None:
+        """Заменяет очередь: грузим только видимые пути, в переданном порядке."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._queue.clear()
+            self._queued.clear()
+            for path in file_paths:
+                if path in self._queued or path in self._in_flight:
+                    continue
+                self._queue.append(path)
+                self._queued.add(path)
+            to_start = min(len(self._queue), self._pool.maxThreadCount()) - self._active_runners
+            self._active_runners += max(to_start, 0)
+        for _ in range(max(to_start, 0)):
+            self._pool.start(_DrainRunnable(self))
+
+    def shutdown(self) -> None:
+        """Отменяет ожидающие задания и дожидается завершения текущих."""
+        with self._lock:
+            self._stopped = True
+            self._queue.clear()
+            self._queued.clear()
+        self._pool.waitForDone()
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._active_runners -= 1
+                    return
+                path = self._queue.popleft()
+                self._queued.discard(path)
+                self._in_flight.add(path)
+            try:
+                image = self._load_func(path)
+            except Exception:
+                image = None
+            with self._lock:
+                self._in_flight.discard(path)
+                stopped = self._stopped
+            if not stopped:
+                self.thumbnailReady.emit(path, image if image is not None else QImage())
+
+
+class ProbePool(QObject):
+    """Параллельный импорт: ``probe.probe_video`` в пуле процессов по числу ядер.
+
+    Результаты приходят сигналом ``probed`` по мере готовности каждого файла
+    (в GUI-поток, т.к. объект живёт в нём), общий прогресс – ``progressChanged``.
+    Пул создаётся при первом импорте и живёт до ``shutdown``, чтобы не платить
+    за запуск процессов каждый раз.
+    """
+
+    probed = pyqtSignal(dict)  # результат probe.probe_video
+    progressChanged = pyqtSignal(int, int)  # готово, всего
+    finished = pyqtSignal()
+
+    def __init__(self, max_workers: int | None = None, parent=None):
+        super().__init__(parent)
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._futures: set[Future] = set()
+        self._done = 0
+        self._total = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: fork процесса с запущенными потоками Qt небезопасен
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def submit(self, file_paths: list[str]) -> None:
+        """Добавляет файлы в очередь; можно вызывать, пока идёт предыдущий импорт."""
+        if not file_paths:
+            return
+        executor = self._get_executor()
+        with self._lock:
+            self._total += len(file_paths)
+            done, total = self._done, self._total
+        self.progressChanged.emit(done, total)
+        futures = [executor.submit(probe.probe_video, path) for path in file_paths]
+        # Сначала регистрируем все задания, потом колбэки – иначе быстрый файл
+        # может опустошить набор и преждевременно вызвать finished
+        with self._lock:
+            self._futures.update(futures)
+        for future in futures:
+            future.add_done_callback(self._on_future_done)
+
+    def is_busy(self) -> bool:
+        with self._lock:
+            return bool(self._futures)
+
+    def cancel(self) -> None:
+        """Отменяет ещё не начатые задания."""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+
+    def shutdown(self) -> None:
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _on_future_done(self, future: Future):
+        # Вызывается в служебном потоке executor'а; сигналы уйдут в GUI-поток очередью
+        with self._lock:
+            self._futures.discard(future)
+            self._done += 1
+            done, total = self._done, self._total
+            all_done = not self._futures
+            if all_done:
+                self._done = self._total = 0
+        if not future.cancelled() and future.exception() is None:
+            result = future.result()
+            tracing.merge(result.pop("trace", None))
+            self.probed.emit(result)
+        self.progressChanged.emit(done, total)
+        if all_done:
+            self.finished.emit()
+
+
+def path_key(file_path: str) -> str:
+    """Нормализованный путь для сравнения (слэши и регистр на Windows)."""
+    return os.path.normcase(os.path.normpath(file_path))
+
+
+def _scan_one_dir(directory: str, extensions: tuple[str, ...]) -> tuple[list[tuple[str, os.stat_result]], list[str]]:
+    """Один уровень каталога: (видеофайлы со stat, подкаталоги)."""
+    files, subdirs = [], []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(extensions) and entry.is_file():
+                        # На Windows stat берётся из данных scandir, на POSIX – один вызов stat
+                        files.append((entry.path, entry.stat()))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files, subdirs
+
+
+class FolderScanWorker(QObject):
+    """Рекурсивный обход каталога в фоновом потоке.
+
+    Каталоги читаются параллельно пулом потоков (на сетевых дисках задержка
+    scandir важнее CPU). Уже известные файлы с прежними размером и mtime
+    отсеиваются по одному stat, новые и изменённые отдаются пачками.
+    """
+
+    batchFound = pyqtSignal(list, list)  # новые пути, изменённые пути
+    finished = pyqtSignal(int, int)  # всего новых, всего изменённых
+
+    BATCH_SIZE = 200
+
+    def __init__(self, root: str, extensions: tuple[str, ...], known: dict[str, tuple[int | None, float | None]],
+                 max_threads: int = 8):
+        super().__init__()
+        self._root = root
+        self._extensions = tuple(f".{ext.lower().lstrip('.')}" for ext in extensions)
+        self._known = known  # path_key -> (file_size, mtime) из базы
+        self._max_threads = max_threads
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    @tracing.traced("FolderScanWorker.run", cat="io")
+    def run(self):
+        new_batch: list[str] = []
+        changed_batch: list[str] = []
+        total_new = total_changed = 0
+
+        def flush():
+            nonlocal new_batch, changed_batch
+            if new_batch or changed_batch:
+                self.batchFound.emit(new_batch, changed_batch)
+                new_batch, changed_batch = [], []
+
+        with ThreadPoolExecutor(max_workers=self._max_threads) as pool:
+            pending = {pool.submit(_scan_one_dir, self._root, self._extensions)}
+            while pending and not self._cancelled:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subdirs = future.result()
+                    for subdir in subdirs:
+                        pending.add(pool.submit(_scan_one_dir, subdir, self._extensions))
+                    for file_path, st in files:
+                        known = self._known.get(path_key(file_path))
+                        if known is None:
+                            new_batch.append(file_path)
+                            total_new += 1
+                        elif known != (st.st_size, st.st_mtime):
+                            changed_batch.append(file_path)
+                            total_changed += 1
+                    if len(new_batch) + len(changed_batch) >= self.BATCH_SIZE:
+                        flush()
+            for future in pending:
+                future.cancel()
+        flush()
+        self.finished.emit(total_new, total_changed)
+
+
+class SearchWorker(QObject):
+    """Полнотекстовый поиск в отдельном потоке со своим соединением на чтение.
+
+    Каждому запросу GUI присваивает номер поколения. ``supersede`` (вызывается
+    из GUI-потока) помечает все более старые запросы устаревшими и прерывает
+    выполняющийся SQL через ``Connection.interrupt``; устаревшие запросы из
+    очереди пропускаются. Результаты отдаются страницами по мере чтения.
+    """
+
+    resultsReady = pyqtSignal(int, list, bool)  # поколение, страница id, последняя страница
+
+    PAGE_SIZE = 500
+
+    def __init__(self, db_path: str):
+        super().__init__()
+        self._db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._latest = 0
+        self._running = 0  # поколение выполняющегося запроса, 0 – простой
+
+    def supersede(self, generation: int) -> None:
+        with self._lock:
+            self._latest = generation
+            if self._running and self._running != generation and self._conn is not None:
+                self._conn.interrupt()
+
+    def _is_stale(self, generation: int) -> bool:
+        with self._lock:
+            return generation != self._latest
+
+    @tracing.traced("SearchWorker.search", cat="sqlite")
+    def search(self, generation: int, text: str) -> None:
+        """Слот, выполняется в потоке воркера."""
+        if self._is_stale(generation):
+            return
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+        with self._lock:
+            self._running = generation
+        try:
+            for page in database.search_video_ids(self._conn, text, self.PAGE_SIZE):
+                if self._is_stale(generation):
+                    return
+                self.resultsReady.emit(generation, page, False)
+            if not self._is_stale(generation):
+                self.resultsReady.emit(generation, [], True)
+        except sqlite3.OperationalError:
+            # interrupted или синтаксис запроса – в обоих случаях результат уже не нужен
+            if not self._is_stale(generation):
+                self.resultsReady.emit(generation, [], True)
+        finally:
+            with self._lock:
+                self._running = 0
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None